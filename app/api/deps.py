@@ -1,14 +1,18 @@
+import hashlib
 import uuid
-from typing import AsyncGenerator
-from fastapi import Depends, Request
+from typing import AsyncGenerator, Awaitable, Callable
+from fastapi import Depends, HTTPException, Request, Response, status
 from jose import JWTError
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.core import security
+from app.core.cache import user_cache
 from app.core.config import settings
+from app.core.rate_limit import Rate, rate_limiter
 from app.core.exceptions import UnauthorizedError
 from app.db.session import get_db
 from app.models.user import User
+from app.repositories.session import SessionRepository
 from app.repositories.user import UserRepository
 
 async def get_current_user(
@@ -19,17 +23,93 @@ async def get_current_user(
         raise UnauthorizedError(message="Not authenticated")
     
     try:
-        payload = security.decode_token(token, settings.SECRET_KEY)
+        payload = security.decode_token_cached(token, settings.SECRET_KEY)
         user_id = payload.get("sub")
-        if user_id is None or payload.get("type") != "access":
+        session_id = payload.get("sid")
+        if user_id is None or session_id is None or payload.get("type") != "access":
             raise UnauthorizedError(message="Invalid token")
     except JWTError:
         raise UnauthorizedError(message="Could not validate credentials")
+
+    if await SessionRepository(db).is_revoked(uuid.UUID(session_id)):
+        raise UnauthorizedError(message="Session revoked")
         
-    user_repo = UserRepository(db)
-    user = await user_repo.get(uuid.UUID(user_id))
-    if not user:
-        raise UnauthorizedError(message="User not found")
+    user = user_cache.get(user_id, "user")
+    if user is None:
+        user_repo = UserRepository(db)
+        user = await user_repo.get(uuid.UUID(user_id))
+        if not user:
+            raise UnauthorizedError(message="User not found")
+        user_cache.set(user_id, "user", user)
     if not user.is_active:
         raise UnauthorizedError(message="Inactive user")
     return user
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+async def data_version(
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+) -> int:
+    """The user's data version, fresh from the database on every request.
+
+    The user from `get_current_user` may be cached and miss a write made
+    through another worker.
+    """
+    return await UserRepository(db).get_data_version(current_user.id)
+
+async def etag_headers(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    version: int = Depends(data_version),
+) -> dict[str, str]:
+    """Tag a read with the user's data version and the requested URL.
+
+    Raises a 304 before the endpoint runs when the client's copy is current.
+    """
+    raw = f"{current_user.id}:{version}:{request.url.path}?{request.url.query}"
+    etag = f'W/"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {_strip_weak(t) for t in if_none_match.split(",")}
+        if "*" in tags or _strip_weak(etag) in tags:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return headers
+
+def _client_ip_key(request: Request) -> str:
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def _rate_limit_key(request: Request) -> str:
+    # Signed-in clients get their own bucket even behind a shared IP. The
+    # claims only pick the bucket; get_current_user still authenticates.
+    token = request.cookies.get("access_token")
+    if token:
+        try:
+            user_id = security.decode_token_cached(token, settings.SECRET_KEY).get("sub")
+        except JWTError:
+            user_id = None
+        if user_id:
+            return f"user:{user_id}"
+    return _client_ip_key(request)
+
+def rate_limit(
+    name: str, rate: str, per_ip: bool = False
+) -> Callable[[Request], Awaitable[None]]:
+    """Dependency spending one request from the caller's `name` bucket.
+
+    Buckets are per user when signed in, else per client IP; `per_ip`
+    always keys by IP, so sending or dropping a cookie cannot switch
+    buckets. Over the limit, responds 429 with a `Retry-After` header.
+    """
+    parsed = Rate.parse(rate)
+    key = _client_ip_key if per_ip else _rate_limit_key
+
+    async def check_rate_limit(request: Request) -> None:
+        await rate_limiter.hit(f"{name}:{key(request)}", parsed)
+
+    return check_rate_limit
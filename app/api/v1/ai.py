@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.api import deps
+from app.core.config import settings
 from app.models.user import User
 from app.schemas.responses import SuccessResponse
 from app.services.ai import AIService, AIAnalysisResponse
@@ -9,14 +10,19 @@ from app.services.expense import ExpenseService
 
 router = APIRouter()
 
-@router.post("/analyze", response_model=SuccessResponse[AIAnalysisResponse])
+@router.post(
+    "/analyze",
+    response_model=SuccessResponse[AIAnalysisResponse],
+    dependencies=[Depends(deps.rate_limit("ai.analyze", settings.RATE_LIMIT_AI_ANALYZE))],
+)
 async def analyze_spending(
+    force: bool = Query(False, description="Call the model even if this expense snapshot was already analyzed"),
     db: AsyncIOMotorDatabase = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
     # Fetch recent expenses for analysis
     expense_service = ExpenseService(db)
-    expenses = await expense_service.get_expenses(user_id=current_user.id, limit=50)
+    expenses = await expense_service.get_recent_expenses(current_user.id, limit=50)
     
     # Prepare data for AI
     expenses_data = [
@@ -30,7 +36,7 @@ async def analyze_spending(
         for e in expenses
     ]
     
-    ai_service = AIService()
-    analysis = await ai_service.analyze_expenses(expenses_data)
+    ai_service = AIService(db)
+    analysis = await ai_service.analyze_expenses(current_user.id, expenses_data, force=force)
     
     return SuccessResponse(data=analysis)
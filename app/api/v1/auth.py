@@ -3,7 +3,6 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.api import deps
 from app.core.config import settings
-from app.core.security_limiter import limiter
 from app.schemas.auth import LoginRequest, ForgotPasswordRequest, ResetPasswordRequest, ChangePasswordRequest
 from app.schemas.responses import SuccessResponse
 from app.schemas.user import UserCreate, UserInDB, UserUpdate
@@ -13,30 +12,7 @@ from app.repositories.user import UserRepository
 
 router = APIRouter()
 
-@router.post("/register", response_model=SuccessResponse[UserInDB])
-async def register(
-    user_in: UserCreate, db: AsyncIOMotorDatabase = Depends(deps.get_db)
-):
-    auth_service = AuthService(db)
-    user = await auth_service.register(user_in)
-    return SuccessResponse(
-        data=UserInDB.model_validate(user),
-        message="User registered successfully"
-    )
-
-@router.post("/login", response_model=SuccessResponse[UserInDB])
-@limiter.limit("5/minute")
-async def login(
-    request: Request,
-    login_in: LoginRequest,
-    response: Response,
-    db: AsyncIOMotorDatabase = Depends(deps.get_db)
-):
-    auth_service = AuthService(db)
-    user = await auth_service.authenticate(login_in)
-    tokens = auth_service.create_tokens(str(user.id))
-    
-    # Set cookies
+def _set_auth_cookies(response: Response, tokens: dict[str, str]) -> None:
     response.set_cookie(
         key="access_token",
         value=tokens["access_token"],
@@ -55,6 +31,32 @@ async def login(
         samesite="lax",
         path="/",
     )
+
+@router.post("/register", response_model=SuccessResponse[UserInDB])
+async def register(
+    user_in: UserCreate, db: AsyncIOMotorDatabase = Depends(deps.get_db)
+):
+    auth_service = AuthService(db)
+    user = await auth_service.register(user_in)
+    return SuccessResponse(
+        data=UserInDB.model_validate(user),
+        message="User registered successfully"
+    )
+
+@router.post(
+    "/login",
+    response_model=SuccessResponse[UserInDB],
+    dependencies=[Depends(deps.rate_limit("auth.login", settings.RATE_LIMIT_LOGIN, per_ip=True))],
+)
+async def login(
+    login_in: LoginRequest,
+    response: Response,
+    db: AsyncIOMotorDatabase = Depends(deps.get_db)
+):
+    auth_service = AuthService(db)
+    user = await auth_service.authenticate(login_in)
+    tokens = await auth_service.create_tokens(user.id)
+    _set_auth_cookies(response, tokens)
     
     return SuccessResponse(
         data=UserInDB.model_validate(user),
@@ -73,22 +75,21 @@ async def refresh(
         raise UnauthorizedError(message="Refresh token missing")
         
     auth_service = AuthService(db)
-    new_access_token = await auth_service.refresh_access_token(refresh_token)
-    
-    response.set_cookie(
-        key="access_token",
-        value=new_access_token,
-        httponly=True,
-        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        secure=settings.COOKIE_SECURE,
-        samesite="lax",
-        path="/",
-    )
+    tokens = await auth_service.refresh_tokens(refresh_token)
+    _set_auth_cookies(response, tokens)
     
     return SuccessResponse(message="Token refreshed successfully")
 
 @router.post("/logout", response_model=SuccessResponse[None])
-async def logout(response: Response):
+async def logout(
+    request: Request,
+    response: Response,
+    db: AsyncIOMotorDatabase = Depends(deps.get_db)
+):
+    auth_service = AuthService(db)
+    await auth_service.logout(
+        request.cookies.get("access_token"), request.cookies.get("refresh_token")
+    )
     response.delete_cookie("access_token", path="/")
     response.delete_cookie("refresh_token", path="/")
     return SuccessResponse(message="Logged out successfully")
@@ -118,26 +119,34 @@ async def reset_password(
 @router.post("/change-password", response_model=SuccessResponse[None])
 async def change_password(
     request_in: ChangePasswordRequest,
+    response: Response,
     current_user: User = Depends(deps.get_current_user),
     db: AsyncIOMotorDatabase = Depends(deps.get_db)
 ):
     auth_service = AuthService(db)
     await auth_service.change_password(current_user, request_in.current_password, request_in.new_password)
+    # Every session was revoked; keep this client signed in with a new one
+    _set_auth_cookies(response, await auth_service.create_tokens(current_user.id))
     return SuccessResponse(message="Password changed successfully")
 
 @router.patch("/me", response_model=SuccessResponse[UserInDB])
 async def update_me(
     user_update: UserUpdate,
+    response: Response,
     current_user: User = Depends(deps.get_current_user),
     db: AsyncIOMotorDatabase = Depends(deps.get_db)
 ):
     user_repo = UserRepository(db)
     update_data = user_update.model_dump(exclude_unset=True)
-    if "password" in update_data:
-        from app.core import security
-        update_data["hashed_password"] = security.get_password_hash(update_data.pop("password"))
+    password = update_data.pop("password", None)
         
-    updated_user = await user_repo.update(db_obj=current_user, obj_in=update_data)
+    updated_user = current_user
+    if update_data:
+        updated_user = await user_repo.update(db_obj=current_user, obj_in=update_data)
+    if password is not None:
+        auth_service = AuthService(db)
+        await auth_service.set_password(updated_user, password)
+        _set_auth_cookies(response, await auth_service.create_tokens(updated_user.id))
     return SuccessResponse(
         data=UserInDB.model_validate(updated_user),
         message="Profile updated successfully"
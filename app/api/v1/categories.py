@@ -3,7 +3,8 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import List
 import uuid
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import data_version, etag_headers, get_db, get_current_user, rate_limit
+from app.core.config import settings
 from app.models.user import User
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryInDB
 from app.services.category import CategoryService
@@ -12,13 +13,21 @@ from app.schemas.responses import SuccessResponse
 
 router = APIRouter()
 
-@router.get("", response_model=SuccessResponse[List[CategoryInDB]])
+@router.get(
+    "",
+    response_model=SuccessResponse[List[CategoryInDB]],
+    dependencies=[
+        Depends(rate_limit("categories.list", settings.RATE_LIMIT_LIST)),
+        Depends(etag_headers),
+    ],
+)
 async def get_categories(
     db: AsyncIOMotorDatabase = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    version: int = Depends(data_version),
 ):
     service = CategoryService(db)
-    categories = await service.get_categories(current_user.id)
+    categories = await service.get_categories(current_user.id, version)
     return SuccessResponse(data=[CategoryInDB.model_validate(c) for c in categories])
 
 @router.post("", response_model=SuccessResponse[CategoryInDB], status_code=status.HTTP_201_CREATED)
@@ -1,23 +1,54 @@
 import uuid
 from datetime import date
-from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.api import deps
+from app.core.config import settings
+from app.core.exceptions import ValidationError
 from app.models.user import User
 from app.schemas.expense import (
+    EXPENSE_FIELDS,
     ExpenseCreate, 
     ExpenseUpdate, 
     ExpenseInDB, 
     ExpenseSummary,
-    ExpenseList
+    ExpenseTimeseries,
+    ExpenseList,
+    ExpenseImportResult,
+    ExpenseBulkRequest,
+    ExpenseBulkResult,
+    expense_fields_model,
 )
 from app.schemas.responses import SuccessResponse
-from app.services.expense import ExpenseService
+from app.services.expense import ExpenseService, iter_csv_rows, iter_ndjson_rows
 
 router = APIRouter()
 
+def expense_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated expense fields to return, e.g. `id,title,amount,date,category`",
+    ),
+) -> frozenset[str] | None:
+    if fields is None:
+        return None
+    requested = frozenset(f.strip() for f in fields.split(",") if f.strip())
+    unknown = requested - EXPENSE_FIELDS
+    if not requested or unknown:
+        raise ValidationError(
+            message="Invalid fields",
+            data={"unknown": sorted(unknown), "allowed": sorted(EXPENSE_FIELDS)},
+        )
+    return requested
+
+def sparse_response(data, headers: dict[str, str] | None = None) -> JSONResponse:
+    # Bypasses response_model validation, which expects every field
+    return JSONResponse(content=jsonable_encoder(SuccessResponse(data=data)), headers=headers)
+
 @router.post("", response_model=SuccessResponse[ExpenseInDB])
 async def create_expense(
     expense_in: ExpenseCreate,
@@ -28,19 +59,77 @@ async def create_expense(
     expense = await service.create_expense(current_user.id, expense_in)
     return SuccessResponse(data=ExpenseInDB.model_validate(expense))
 
-@router.get("", response_model=SuccessResponse[ExpenseList])
+@router.post(
+    "/import",
+    response_model=SuccessResponse[ExpenseImportResult],
+    dependencies=[Depends(deps.rate_limit("expenses.import", settings.RATE_LIMIT_IMPORT))],
+)
+async def import_expenses(
+    file: UploadFile = File(..., description="CSV with a header row, or one JSON object per line"),
+    format: Optional[Literal["csv", "ndjson"]] = Query(
+        None, description="Defaults to the file extension or content type"
+    ),
+    db: AsyncIOMotorDatabase = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    if format is None:
+        filename = (file.filename or "").lower()
+        content_type = file.content_type or ""
+        if filename.endswith(".csv") or content_type == "text/csv":
+            format = "csv"
+        elif filename.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+            format = "ndjson"
+        else:
+            raise ValidationError(message="Cannot detect import format; pass format=csv or format=ndjson")
+
+    # The upload is spooled to disk, so rows are read lazily from the file
+    rows = iter_csv_rows(file.file) if format == "csv" else iter_ndjson_rows(file.file)
+    service = ExpenseService(db)
+    result = await service.import_expenses(current_user.id, rows)
+    return SuccessResponse(
+        data=ExpenseImportResult(**result),
+        message=f"Imported {result['inserted_count']} expenses ({result['error_count']} rejected)",
+    )
+
+@router.post("/bulk", response_model=SuccessResponse[ExpenseBulkResult])
+async def bulk_expenses(
+    bulk_in: ExpenseBulkRequest,
+    db: AsyncIOMotorDatabase = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    service = ExpenseService(db)
+    result = await service.bulk_expenses(current_user.id, bulk_in)
+    verb = "Updated" if bulk_in.action == "update" else "Deleted"
+    return SuccessResponse(
+        data=ExpenseBulkResult(**result),
+        message=f"{verb} {result['affected_count']} expenses",
+    )
+
+@router.get(
+    "",
+    response_model=SuccessResponse[ExpenseList],
+    dependencies=[Depends(deps.rate_limit("expenses.list", settings.RATE_LIMIT_LIST))],
+)
 async def list_expenses(
     category: Optional[str] = None,
     avoidable: Optional[bool] = None,
-    search_query: Optional[str] = None,
+    search_query: Optional[str] = Query(None, max_length=100),
+    search_prefix: bool = Query(False, description="Also match the last search term as a word prefix"),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    sort_by: str = Query("date"),
+    # Each sort has a (user_id, field, id) index for keyset paging
+    sort_by: Literal["date", "amount", "title", "relevance"] = Query(
+        "date", description="Field to sort by, or `relevance` with a search_query"
+    ),
     sort_order: int = Query(-1, ge=-1, le=1),
+    cursor: Optional[str] = Query(None, description="Opaque `next_cursor` from the previous page; takes precedence over `skip`"),
+    fields: frozenset[str] | None = Depends(expense_fields),
     db: AsyncIOMotorDatabase = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
+    etag_headers: dict[str, str] = Depends(deps.etag_headers),
+    data_version: int = Depends(deps.data_version),
 ):
     service = ExpenseService(db)
     result = await service.get_expenses(
@@ -48,34 +137,102 @@ async def list_expenses(
         category=category,
         avoidable=avoidable,
         search_query=search_query,
+        search_prefix=search_prefix,
         start_date=start_date,
         end_date=end_date,
         skip=skip,
         limit=limit,
         sort_by=sort_by,
         sort_order=sort_order,
+        cursor=cursor,
+        fields=fields,
+        data_version=data_version,
+    )
+    if fields is not None:
+        return sparse_response(result, etag_headers)
+    return SuccessResponse(data=result)
+
+@router.get(
+    "/export",
+    dependencies=[Depends(deps.rate_limit("expenses.export", settings.RATE_LIMIT_EXPORT))],
+)
+async def export_expenses(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    category: Optional[str] = None,
+    avoidable: Optional[bool] = None,
+    search_query: Optional[str] = Query(None, max_length=100),
+    search_prefix: bool = False,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncIOMotorDatabase = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    service = ExpenseService(db)
+    chunks = service.export_expenses(
+        current_user.id,
+        format,
+        category=category,
+        avoidable=avoidable,
+        search_query=search_query,
+        search_prefix=search_prefix,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="expenses.{format}"'},
     )
-    return SuccessResponse(data=ExpenseList.model_validate(result))
 
-@router.get("/summary", response_model=SuccessResponse[ExpenseSummary])
+@router.get(
+    "/summary",
+    response_model=SuccessResponse[ExpenseSummary],
+    dependencies=[Depends(deps.etag_headers)],
+)
 async def get_summary(
     year: int = Query(...),
     month: int = Query(..., ge=1, le=12),
     db: AsyncIOMotorDatabase = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
+    data_version: int = Depends(deps.data_version),
+):
+    service = ExpenseService(db)
+    summary = await service.get_monthly_summary(current_user.id, year, month, data_version)
+    return SuccessResponse(data=summary)
+
+@router.get(
+    "/timeseries",
+    response_model=SuccessResponse[ExpenseTimeseries],
+    dependencies=[Depends(deps.etag_headers)],
+)
+async def get_timeseries(
+    start: date = Query(...),
+    end: date = Query(...),
+    bucket: Literal["day", "week", "month"] = Query("month"),
+    group_by: Optional[Literal["category"]] = Query(None),
+    db: AsyncIOMotorDatabase = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    data_version: int = Depends(deps.data_version),
 ):
     service = ExpenseService(db)
-    summary = await service.get_monthly_summary(current_user.id, year, month)
-    return SuccessResponse(data=ExpenseSummary(**summary))
+    timeseries = await service.get_timeseries(
+        current_user.id, start, end, bucket, group_by, data_version
+    )
+    return SuccessResponse(data=timeseries)
 
 @router.get("/{expense_id}", response_model=SuccessResponse[ExpenseInDB])
 async def get_expense(
     expense_id: uuid.UUID,
+    fields: frozenset[str] | None = Depends(expense_fields),
     db: AsyncIOMotorDatabase = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
+    etag_headers: dict[str, str] = Depends(deps.etag_headers),
 ):
     service = ExpenseService(db)
-    expense = await service.get_expense(expense_id, current_user.id)
+    expense = await service.get_expense(expense_id, current_user.id, fields=fields)
+    if fields is not None:
+        return sparse_response(expense_fields_model(fields).model_validate(expense), etag_headers)
     return SuccessResponse(data=ExpenseInDB.model_validate(expense))
 
 @router.patch("/{expense_id}", response_model=SuccessResponse[ExpenseInDB])
@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.api import deps
+from app.core.config import settings
 from app.models.user import User
 from app.schemas.pot import PotCreate, PotUpdate, PotInDB
 from app.schemas.responses import SuccessResponse
@@ -28,15 +29,23 @@ async def create_pot(
     
     return SuccessResponse(data=PotInDB(**pot_data))
 
-@router.get("", response_model=SuccessResponse[list[PotInDB]])
+@router.get(
+    "",
+    response_model=SuccessResponse[list[PotInDB]],
+    dependencies=[
+        Depends(deps.rate_limit("pots.list", settings.RATE_LIMIT_LIST)),
+        Depends(deps.etag_headers),
+    ],
+)
 async def list_pots(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     db: AsyncIOMotorDatabase = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
+    data_version: int = Depends(deps.data_version),
 ):
     service = PotService(db)
-    pots = await service.get_pots(current_user.id, skip, limit)
+    pots = await service.get_pots(current_user.id, skip, limit, data_version)
     
     res_data = []
     for pot in pots:
@@ -47,7 +56,11 @@ async def list_pots(
         
     return SuccessResponse(data=res_data)
 
-@router.get("/{pot_id}", response_model=SuccessResponse[PotInDB])
+@router.get(
+    "/{pot_id}",
+    response_model=SuccessResponse[PotInDB],
+    dependencies=[Depends(deps.etag_headers)],
+)
 async def get_pot(
     pot_id: uuid.UUID,
     db: AsyncIOMotorDatabase = Depends(deps.get_db),
@@ -0,0 +1,281 @@
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Hashable, Protocol, TypeVar
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=256)
+def _type_adapter(type_: Any) -> TypeAdapter:
+    return TypeAdapter(type_)
+
+
+class UserScopedCache:
+    """In-process LRU cache with per-entry expiry, invalidated per user.
+
+    Keys are `(user_id, key)` pairs so that every entry belonging to a user
+    can be dropped at once when that user writes. When `max_bytes` is set,
+    `sizeof` measures each value and least recently used entries are evicted
+    to stay within the budget.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] = len,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._data: OrderedDict[tuple[str, Hashable], tuple[float, Any, int]] = OrderedDict()
+        self._user_keys: dict[str, set[Hashable]] = {}
+
+    def get(self, user_id: Any, key: Hashable) -> Any | None:
+        full_key = (str(user_id), key)
+        entry = self._data.get(full_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._discard(full_key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(full_key)
+        self.hits += 1
+        return value
+
+    def set(self, user_id: Any, key: Hashable, value: Any) -> None:
+        full_key = (str(user_id), key)
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._discard(full_key)
+        self._data[full_key] = (time.monotonic() + self.ttl, value, size)
+        self.bytes += size
+        self._user_keys.setdefault(full_key[0], set()).add(key)
+        while len(self._data) > self.maxsize or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        ):
+            self._discard(next(iter(self._data)))
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: Any) -> None:
+        user = str(user_id)
+        for key in self._user_keys.pop(user, ()):
+            entry = self._data.pop((user, key), None)
+            if entry is not None:
+                self.bytes -= entry[2]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._user_keys.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "bytes": self.bytes,
+        }
+
+    def _discard(self, full_key: tuple[str, Hashable]) -> None:
+        entry = self._data.pop(full_key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+        keys = self._user_keys.get(full_key[0])
+        if keys is not None:
+            keys.discard(full_key[1])
+            if not keys:
+                del self._user_keys[full_key[0]]
+
+
+class TokenCache:
+    """LRU of verified JWT claims, each entry valid until the token's `exp`.
+
+    Keys are digests, so raw tokens are never held in memory here.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[bytes, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def get(self, key: bytes) -> dict[str, Any] | None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])
+
+    def set(self, key: bytes, claims: dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        self._data[key] = (exp, dict(claims))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "entries": len(self._data),
+        }
+
+
+class CacheBackend(Protocol):
+    """Storage for serialized responses, shared or per process."""
+
+    async def get(self, user_id: str, key: str) -> bytes | None: ...
+
+    async def set(self, user_id: str, key: str, value: bytes) -> None: ...
+
+    async def invalidate_user(self, user_id: str) -> None: ...
+
+
+class MemoryCacheBackend:
+    """Per-process backend; other workers only see a user's writes after `ttl`."""
+
+    def __init__(self, maxsize: int, ttl: float, max_bytes: int):
+        self.cache = UserScopedCache(maxsize, ttl, max_bytes=max_bytes)
+
+    async def get(self, user_id: str, key: str) -> bytes | None:
+        return self.cache.get(user_id, key)
+
+    async def set(self, user_id: str, key: str, value: bytes) -> None:
+        self.cache.set(user_id, key, value)
+
+    async def invalidate_user(self, user_id: str) -> None:
+        self.cache.invalidate_user(user_id)
+
+
+class MongoCacheBackend:
+    """Backend shared by every worker, stored in a collection with a TTL index.
+
+    Expired entries are filtered on read since the TTL monitor only runs
+    about once a minute.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, ttl: float):
+        self.collection = collection
+        self.ttl = ttl
+
+    async def get(self, user_id: str, key: str) -> bytes | None:
+        doc = await self.collection.find_one(
+            {"user_id": user_id, "key": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"_id": 0, "value": 1},
+        )
+        return doc["value"] if doc else None
+
+    async def set(self, user_id: str, key: str, value: bytes) -> None:
+        await self.collection.update_one(
+            {"user_id": user_id, "key": key},
+            {
+                "$set": {
+                    "value": value,
+                    "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl),
+                }
+            },
+            upsert=True,
+        )
+
+    async def invalidate_user(self, user_id: str) -> None:
+        await self.collection.delete_many({"user_id": user_id})
+
+
+class ResponseCache:
+    """Per-user cache of service results, dropped on the user's next write.
+
+    Values are stored as JSON and validated back into the type given for
+    each entry, so every hit returns a fresh copy and the memory budget
+    counts real bytes. Nothing read back from a backend is ever executed.
+    """
+
+    def __init__(self, backend: CacheBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        return repr(parts)
+
+    async def get(self, user_id: Any, key: str, type_: type[T]) -> T | None:
+        if not self.enabled:
+            return None
+        value = await self.backend.get(str(user_id), key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _type_adapter(type_).validate_json(value)
+
+    async def set(self, user_id: Any, key: str, value: T, type_: type[T]) -> None:
+        if self.enabled:
+            await self.backend.set(str(user_id), key, _type_adapter(type_).dump_json(value))
+
+    async def invalidate_user(self, user_id: Any) -> None:
+        await self.backend.invalidate_user(str(user_id))
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+        if isinstance(self.backend, MemoryCacheBackend):
+            memory = self.backend.cache.stats()
+            stats.update(evictions=memory["evictions"], entries=memory["entries"], bytes=memory["bytes"])
+        return stats
+
+
+# Authenticated users by id; the TTL bounds how long another worker may
+# keep serving a user after they were changed or deactivated
+user_cache = UserScopedCache(
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+token_cache = TokenCache(maxsize=settings.TOKEN_CACHE_MAXSIZE)
+
+response_cache = ResponseCache(
+    MemoryCacheBackend(
+        maxsize=settings.RESPONSE_CACHE_MAXSIZE,
+        ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+        max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    ),
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+)
@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import List, Literal, Union
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,6 +16,13 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     COOKIE_SECURE: bool = False
+    # Pick a value with `python calibrate_bcrypt.py`; existing hashes are
+    # rehashed with it on their owner's next login
+    BCRYPT_ROUNDS: int = 12
+    # Threads hashing/verifying passwords at once; further requests wait up
+    # to the queue timeout, then get a 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = 5.0
 
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
@@ -33,9 +40,81 @@ class Settings(BaseSettings):
     DATABASE_URL: str = ""
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "expense_intelligence"
+    MONGODB_ENSURE_INDEXES: bool = True
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 5
+    MONGODB_MAX_IDLE_TIME_MS: int = 300000
+    # Offered in order, e.g. "zstd,snappy,zlib"; zstd needs the `zstandard`
+    # package and snappy `python-snappy`. Empty disables compression.
+    MONGODB_COMPRESSORS: str = "zlib"
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    # How long a request may wait for a free pooled connection
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 5000
+    # Per-method read preference for analytics reads, e.g.
+    # {"ExpenseRepository.get_timeseries": "secondaryPreferred"}. Everything
+    # else, including all writes, runs on the primary.
+    MONGODB_READ_PREFERENCES: dict[str, str] = {}
+    # -1 for no limit; otherwise at least 90
+    MONGODB_MAX_STALENESS_SECONDS: int = 90
+
+    # Serve /expenses/summary from the expense_rollups collection
+    # (populate existing data first with `python rebuild_rollups.py`)
+    EXPENSE_ROLLUPS_ENABLED: bool = True
+    # Shorter title searches use a regex instead of the text index
+    EXPENSE_SEARCH_MIN_TEXT_LENGTH: int = 3
+    EXPENSE_IMPORT_BATCH_SIZE: int = 1000
+    EXPENSE_IMPORT_MAX_REPORTED_ERRORS: int = 100
+    EXPENSE_EXPORT_BATCH_SIZE: int = 1000
+    EXPENSE_TIMESERIES_MAX_BUCKETS: int = 1000
+
+    # Per-user response cache; "mongo" shares entries between workers
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: Literal["memory", "mongo"] = "memory"
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+    RESPONSE_CACHE_MAXSIZE: int = 10000
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Authenticated users cached by get_current_user
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_MAXSIZE: int = 10000
+    # Verified access/refresh token claims, each kept until the token expires
+    TOKEN_CACHE_MAXSIZE: int = 10000
+
+    # Revoked sessions are mirrored in an in-process Bloom filter, refreshed
+    # from the sessions collection every SYNC_SECONDS; until then, another
+    # worker's logout only reaches this worker's access-token checks
+    SESSION_REVOCATION_SYNC_SECONDS: int = 10
+    SESSION_REVOCATION_SYNC_MARGIN_SECONDS: int = 60
+    SESSION_REVOCATION_CAPACITY: int = 100000
+    SESSION_REVOCATION_ERROR_RATE: float = 0.001
+    # A refresh token rotated away this recently is taken as a concurrent
+    # refresh (another tab) rather than reuse; 0 disables the grace window
+    SESSION_REFRESH_GRACE_SECONDS: int = 30
+
+    # Token buckets per user (per client IP when signed out), written as
+    # "<count>/<second|minute|hour|day>"; "mongo" shares them between workers
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal["memory", "mongo"] = "memory"
+    RATE_LIMIT_MAXSIZE: int = 100000
+    RATE_LIMIT_LOGIN: str = "5/minute"
+    RATE_LIMIT_AI_ANALYZE: str = "10/hour"
+    RATE_LIMIT_IMPORT: str = "10/hour"
+    RATE_LIMIT_EXPORT: str = "30/hour"
+    RATE_LIMIT_LIST: str = "120/minute"
 
     # Gemini AI
     GEMINI_API_KEY: str = ""
+    # Analyses are reused while the user's expense snapshot is unchanged
+    AI_ANALYSIS_CACHE_TTL_SECONDS: int = 86400
+
+    @field_validator("MONGODB_READ_PREFERENCES")
+    @classmethod
+    def validate_read_preferences(cls, v: dict[str, str]) -> dict[str, str]:
+        allowed = {"primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"}
+        invalid = {method: mode for method, mode in v.items() if mode not in allowed}
+        if invalid:
+            raise ValueError(f"Unknown read preference modes: {invalid}")
+        return v
 
     model_config = SettingsConfigDict(
         env_file=".env", case_sensitive=True, extra="ignore"
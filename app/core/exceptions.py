@@ -1,3 +1,4 @@
+import math
 from typing import Any, Optional
 
 
@@ -8,11 +9,13 @@ class AppError(Exception):
         status_code: int = 400,
         error_code: Optional[str] = None,
         data: Any = None,
+        headers: Optional[dict[str, str]] = None,
     ):
         self.message = message
         self.status_code = status_code
         self.error_code = error_code
         self.data = data
+        self.headers = headers
         super().__init__(message)
 
 
@@ -41,3 +44,24 @@ class InternalServerError(AppError):
         super().__init__(
             message, status_code=500, error_code="INTERNAL_SERVER_ERROR", data=data
         )
+
+
+class ServiceUnavailableError(AppError):
+    def __init__(self, message: str = "Service temporarily unavailable", data: Any = None):
+        super().__init__(
+            message, status_code=503, error_code="SERVICE_UNAVAILABLE", data=data
+        )
+
+
+class RateLimitError(AppError):
+    def __init__(
+        self, message: str = "Too many requests", retry_after: float = 1, data: Any = None
+    ):
+        seconds = max(1, math.ceil(retry_after))
+        super().__init__(
+            message,
+            status_code=429,
+            error_code="RATE_LIMITED",
+            data={"retry_after": seconds} if data is None else data,
+            headers={"Retry-After": str(seconds)},
+        )
@@ -0,0 +1,49 @@
+import base64
+from decimal import Decimal
+from typing import Any
+
+from bson import json_util
+from bson.decimal128 import Decimal128
+
+from app.core.exceptions import ValidationError
+from app.db.codecs import UUID_REPRESENTATION
+
+_JSON_OPTIONS = json_util.JSONOptions(uuid_representation=UUID_REPRESENTATION)
+
+
+def encode_cursor(sort_by: str, sort_order: int, value: Any, last_id: Any) -> str:
+    """Build an opaque keyset cursor pointing just past `(value, last_id)`."""
+    if isinstance(value, Decimal):
+        value = Decimal128(value)
+    payload = json_util.dumps(
+        {"s": sort_by, "o": sort_order, "v": value, "id": last_id}, json_options=_JSON_OPTIONS
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: int) -> tuple[Any, Any]:
+    """Return the `(value, last_id)` seek position stored in `cursor`.
+
+    The cursor is only valid for the sort it was issued with.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()), json_options=_JSON_OPTIONS)
+        value, last_id = payload["v"], payload["id"]
+        issued_for = (payload["s"], payload["o"])
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError(message="Invalid cursor")
+    if issued_for != (sort_by, sort_order):
+        raise ValidationError(message="Cursor does not match the requested sort")
+    return value, last_id
+
+
+def seek_filter(sort_by: str, sort_order: int, value: Any, last_id: Any) -> dict[str, Any]:
+    """Match documents strictly after `(value, last_id)` in `(sort_by, id)` order."""
+    op = "$lt" if sort_order == -1 else "$gt"
+    return {
+        "$or": [
+            {sort_by: {op: value}},
+            {sort_by: value, "id": {op: last_id}},
+        ]
+    }
@@ -0,0 +1,143 @@
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.exceptions import RateLimitError
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$")
+
+
+@dataclass(frozen=True)
+class Rate:
+    """A token bucket: `capacity` requests at once, refilled over `period` seconds."""
+
+    capacity: int
+    period: float
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        """Parse "<count>/<second|minute|hour|day>", e.g. "10/minute"."""
+        match = _RATE_PATTERN.match(value)
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"Invalid rate limit {value!r}; expected e.g. '10/minute'")
+        return cls(int(match.group(1)), _PERIODS[match.group(2)])
+
+
+class RateLimitBackend(Protocol):
+    """Bucket storage. `take` spends one token and returns the seconds to wait, 0 if allowed."""
+
+    async def take(self, key: str, rate: Rate) -> float: ...
+
+
+class MemoryRateLimitBackend:
+    """Per-process buckets; with N workers a client gets up to N times the rate."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: Rate) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (rate.capacity, now))
+        tokens = min(rate.capacity, tokens + (now - updated_at) * rate.refill_per_second)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate.refill_per_second
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+class MongoRateLimitBackend:
+    """Buckets shared by every worker, each updated by one atomic upsert.
+
+    The refill is computed from the server clock (`$$NOW`), so workers with
+    skewed clocks still agree. Idle buckets expire through a TTL index once
+    they would be full again.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def take(self, key: str, rate: Rate) -> float:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        refilled = {
+            "$min": [
+                rate.capacity,
+                {"$add": [{"$ifNull": ["$tokens", rate.capacity]}, {"$multiply": [elapsed, rate.refill_per_second]}]},
+            ]
+        }
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {
+                "$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": {"$add": ["$$NOW", math.ceil(rate.period * 1000)]},
+                }
+            },
+        ]
+        try:
+            doc = await self._update(key, pipeline)
+        except DuplicateKeyError:
+            # A concurrent first request created the bucket; update that one
+            doc = await self._update(key, pipeline)
+        if doc["allowed"]:
+            return 0.0
+        return (1 - doc["tokens"]) / rate.refill_per_second
+
+    async def _update(self, key: str, pipeline: list[dict[str, Any]]) -> dict[str, Any]:
+        return await self.collection.find_one_and_update(
+            {"key": key},
+            pipeline,
+            projection={"_id": 0, "tokens": 1, "allowed": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.allowed = 0
+        self.limited = 0
+
+    async def hit(self, key: str, rate: Rate) -> None:
+        """Spend one request from `key`'s bucket; raise RateLimitError when it is empty."""
+        if not self.enabled:
+            return
+        retry_after = await self.backend.take(key, rate)
+        if retry_after > 0:
+            self.limited += 1
+            raise RateLimitError(retry_after=retry_after)
+        self.allowed += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+
+rate_limiter = RateLimiter(
+    MemoryRateLimitBackend(maxsize=settings.RATE_LIMIT_MAXSIZE),
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
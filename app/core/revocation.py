@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import math
+from datetime import datetime, timedelta
+from typing import Any, Protocol
+
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.core.logging import logger
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false positive rate."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        positions = self._positions(item)
+        if all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions):
+            return
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+class RevokedSessionSource(Protocol):
+    async def revoked_since(self, since: datetime | None) -> list[tuple[Any, datetime]]: ...
+
+
+class RevocationFilter:
+    """Revoked session ids known to this process.
+
+    Revocations made here are added at once; those made by other workers
+    arrive with the next `sync`. A hit may be a false positive, so callers
+    confirm it against the sessions collection; a miss needs no round trip.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, sync_margin: timedelta):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Re-read revocations this far back, in case worker clocks disagree
+        self.sync_margin = sync_margin
+        self.filter = BloomFilter(capacity, error_rate)
+        self.synced_until: datetime | None = None
+        self.checks = 0
+        self.positives = 0
+
+    def add(self, session_id: Any) -> None:
+        self.filter.add(str(session_id))
+
+    def might_contain(self, session_id: Any) -> bool:
+        self.checks += 1
+        if str(session_id) in self.filter:
+            self.positives += 1
+            return True
+        return False
+
+    async def sync(self, source: RevokedSessionSource) -> None:
+        since = self.synced_until - self.sync_margin if self.synced_until else None
+        revoked = await source.revoked_since(since)
+        if self.filter.count + len(revoked) > self.capacity:
+            # Rebuild from unexpired revocations only, dropping stale entries
+            revoked = await source.revoked_since(None)
+            self.filter = BloomFilter(max(self.capacity, len(revoked)), self.error_rate)
+        for session_id, revoked_at in revoked:
+            self.filter.add(str(session_id))
+            if self.synced_until is None or revoked_at > self.synced_until:
+                self.synced_until = revoked_at
+
+    async def sync_forever(self, source: RevokedSessionSource, interval: float) -> None:
+        while True:
+            try:
+                await self.sync(source)
+            except PyMongoError as e:
+                logger.warning(f"Session revocation sync failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": self.filter.count,
+            "checks": self.checks,
+            "positives": self.positives,
+            "synced_until": self.synced_until.isoformat() if self.synced_until else None,
+        }
+
+
+revoked_sessions = RevocationFilter(
+    capacity=settings.SESSION_REVOCATION_CAPACITY,
+    error_rate=settings.SESSION_REVOCATION_ERROR_RATE,
+    sync_margin=timedelta(seconds=settings.SESSION_REVOCATION_SYNC_MARGIN_SECONDS),
+)
@@ -1,16 +1,40 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional, TypeVar, Union
 
 from jose import jwt
 from passlib.context import CryptContext
 
+from app.core.cache import token_cache
 from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+# Hashes with any other cost are flagged by `needs_update` and upgraded on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so threads hash in parallel without blocking the
+# event loop. The semaphore holds callers back while every thread is busy, so
+# nothing queues inside the executor unbounded.
+_password_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_password_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
 
 
 def create_access_token(
-    subject: Union[str, Any], expires_delta: Optional[timedelta] = None
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    session_id: Optional[str] = None,
 ) -> str:
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -19,6 +43,8 @@ def create_access_token(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    if session_id:
+        to_encode["sid"] = session_id
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
@@ -26,7 +52,10 @@ def create_access_token(
 
 
 def create_refresh_token(
-    subject: Union[str, Any], expires_delta: Optional[timedelta] = None
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    session_id: Optional[str] = None,
+    token_id: Optional[str] = None,
 ) -> str:
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -35,19 +64,58 @@ def create_refresh_token(
             days=settings.REFRESH_TOKEN_EXPIRE_DAYS
         )
     to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
+    if session_id:
+        to_encode["sid"] = session_id
+    if token_id:
+        to_encode["jti"] = token_id
     encoded_jwt = jwt.encode(
         to_encode, settings.REFRESH_SECRET_KEY, algorithm=settings.ALGORITHM
     )
     return encoded_jwt
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def _run_password_task(func: Callable[..., T], *args: Any) -> T:
+    try:
+        await asyncio.wait_for(
+            _password_slots.acquire(), timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise ServiceUnavailableError(message="Too many sign-in attempts in progress, please retry")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_pool, func, *args)
+    finally:
+        _password_slots.release()
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_task(pwd_context.verify, plain_password, hashed_password)
 
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Verify a password; also return a fresh hash when the stored one is outdated."""
+    return await _run_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash(password: str) -> str:
+    return await _run_password_task(pwd_context.hash, password)
 
 
 def decode_token(token: str, secret: str) -> dict[str, Any]:
     return jwt.decode(token, secret, algorithms=[settings.ALGORITHM])
+
+
+def decode_token_cached(token: str, secret: str) -> dict[str, Any]:
+    """`decode_token` for tokens a client resends on every request.
+
+    Claims are cached until the token's `exp`; only successfully verified
+    tokens are stored. The secret is part of the key, so a token is never
+    accepted under a key it was not verified with.
+    """
+    key = hashlib.sha256(f"{secret}\0{token}".encode()).digest()
+    claims = token_cache.get(key)
+    if claims is None:
+        claims = decode_token(token, secret)
+        token_cache.set(key, claims)
+    return claims
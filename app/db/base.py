@@ -1,8 +1,12 @@
 from datetime import datetime, timezone
 from pydantic import BaseModel, Field, ConfigDict
+from pymongo import ASCENDING, IndexModel
 import uuid
 
 class Base(BaseModel):
+    # Every document is addressed by its application-level `id`
+    __indexes__ = [IndexModel([("id", ASCENDING)], name="id_unique", unique=True)]
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
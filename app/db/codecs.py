@@ -0,0 +1,52 @@
+import enum
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions, TypeCodec, TypeEncoder, TypeRegistry
+from bson.decimal128 import Decimal128, create_decimal128_context
+
+# Rounds to the 34 significant digits Decimal128 can hold
+_DECIMAL128_CONTEXT = create_decimal128_context()
+
+
+class DecimalCodec(TypeCodec):
+    """Store Decimal as Decimal128 so amounts and `$sum` totals stay exact."""
+
+    python_type = Decimal
+    bson_type = Decimal128
+
+    def transform_python(self, value: Decimal) -> Decimal128:
+        # Decimal128 raises Inexact on longer values; round them instead
+        return Decimal128(_DECIMAL128_CONTEXT.create_decimal(value))
+
+    def transform_bson(self, value: Decimal128) -> Decimal:
+        return value.to_decimal()
+
+
+class DateEncoder(TypeEncoder):
+    """Store calendar dates as midnight datetimes; BSON has no date-only type.
+
+    Decoding is left to the models, which accept midnight datetimes for
+    `date` fields.
+    """
+
+    python_type = date
+
+    def transform_python(self, value: date) -> datetime:
+        return datetime.combine(value, datetime.min.time())
+
+
+def _fallback_encoder(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+# UUIDs are stored as BSON binary subtype 4
+UUID_REPRESENTATION = UuidRepresentation.STANDARD
+
+type_registry = TypeRegistry([DecimalCodec(), DateEncoder()], fallback_encoder=_fallback_encoder)
+
+codec_options = CodecOptions(type_registry=type_registry, uuid_representation=UUID_REPRESENTATION)
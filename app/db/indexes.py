@@ -0,0 +1,219 @@
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Type
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import BaseModel
+from pymongo.errors import OperationFailure
+
+from app.models.ai_analysis import AIAnalysisCacheEntry
+from app.models.category import Category
+from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollup
+from app.models.expense_stats import ExpenseUserStats
+from app.models.pot import Pot
+from app.models.rate_limit import RateLimitBucket
+from app.models.response_cache import ResponseCacheEntry
+from app.models.session import Session
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Models whose `__indexes__` are applied at startup
+INDEXED_MODELS: list[Type[BaseModel]] = [
+    User, Expense, ExpenseRollup, ExpenseUserStats, Pot, Category, ResponseCacheEntry, Session,
+    RateLimitBucket, AIAnalysisCacheEntry,
+]
+
+_SAMPLE_ID = uuid.UUID(int=0)
+_SAMPLE_DATE = datetime(2024, 1, 1)
+
+
+@dataclass
+class QueryShape:
+    """A repository query whose plan must be served by an index."""
+
+    name: str
+    model: Type[BaseModel]
+    filter: dict[str, Any] | None = None
+    sort: dict[str, int] | None = None
+    pipeline: list[dict[str, Any]] | None = None
+
+
+QUERY_SHAPES: list[QueryShape] = [
+    QueryShape("BaseRepository.get", Expense, filter={"id": _SAMPLE_ID}),
+    QueryShape("UserRepository.get_by_email", User, filter={"email": "user@example.com"}),
+    QueryShape(
+        "ExpenseRepository.get_multi_by_user",
+        Expense,
+        filter={"user_id": _SAMPLE_ID, "date": {"$gte": _SAMPLE_DATE}},
+        sort={"date": -1, "id": -1},
+    ),
+    QueryShape(
+        "ExpenseRepository.get_multi_by_user[cursor]",
+        Expense,
+        filter={
+            "user_id": _SAMPLE_ID,
+            "$or": [
+                {"date": {"$lt": _SAMPLE_DATE}},
+                {"date": _SAMPLE_DATE, "id": {"$lt": _SAMPLE_ID}},
+            ],
+        },
+        sort={"date": -1, "id": -1},
+    ),
+    QueryShape(
+        "ExpenseRepository.get_multi_by_user[cursor, amount]",
+        Expense,
+        filter={
+            "user_id": _SAMPLE_ID,
+            "$or": [
+                {"amount": {"$lt": 10}},
+                {"amount": 10, "id": {"$lt": _SAMPLE_ID}},
+            ],
+        },
+        sort={"amount": -1, "id": -1},
+    ),
+    QueryShape(
+        "ExpenseRepository.get_multi_by_user[cursor, title]",
+        Expense,
+        filter={
+            "user_id": _SAMPLE_ID,
+            "$or": [
+                {"title": {"$gt": "Coffee"}},
+                {"title": "Coffee", "id": {"$gt": _SAMPLE_ID}},
+            ],
+        },
+        sort={"title": 1, "id": 1},
+    ),
+    QueryShape(
+        "ExpenseRepository.get_multi_by_user[category]",
+        Expense,
+        filter={"user_id": _SAMPLE_ID, "category": "Food", "date": {"$gte": _SAMPLE_DATE}},
+        sort={"date": -1, "id": -1},
+    ),
+    QueryShape(
+        "ExpenseRepository.get_multi_by_user[search]",
+        Expense,
+        filter={"user_id": _SAMPLE_ID, "$text": {"$search": '"coffee"'}},
+        sort={"date": -1, "id": -1},
+    ),
+    QueryShape(
+        "ExpenseRepository.get_multi_by_user[prefix]",
+        Expense,
+        filter={"user_id": _SAMPLE_ID, "title_tokens": {"$regex": "^cof"}},
+        sort={"date": -1, "id": -1},
+    ),
+    QueryShape(
+        "ExpenseRepository.get_monthly_summary",
+        Expense,
+        pipeline=[
+            {"$match": {"user_id": _SAMPLE_ID, "date": {"$gte": _SAMPLE_DATE, "$lt": _SAMPLE_DATE}}},
+            {"$group": {"_id": None, "total": {"$sum": "$amount"}}},
+        ],
+    ),
+    QueryShape(
+        "ExpenseRepository.get_lifetime_total",
+        Expense,
+        pipeline=[
+            {"$match": {"user_id": _SAMPLE_ID}},
+            {"$group": {"_id": None, "total": {"$sum": "$amount"}}},
+        ],
+    ),
+    QueryShape(
+        "ExpenseRepository.get_timeseries",
+        Expense,
+        pipeline=[
+            {"$match": {"user_id": _SAMPLE_ID, "date": {"$gte": _SAMPLE_DATE, "$lte": _SAMPLE_DATE}}},
+            {"$group": {"_id": {"$dateTrunc": {"date": "$date", "unit": "day"}}, "total": {"$sum": "$amount"}}},
+        ],
+    ),
+    QueryShape(
+        "ExpenseRollupRepository.get_month",
+        ExpenseRollup,
+        filter={"user_id": _SAMPLE_ID, "year": 2024, "month": 1, "count": {"$gt": 0}},
+    ),
+    QueryShape("ExpenseStatsRepository.get_by_user", ExpenseUserStats, filter={"user_id": _SAMPLE_ID}),
+    QueryShape("PotRepository.get_multi_by_user", Pot, filter={"user_id": _SAMPLE_ID}),
+    QueryShape("CategoryRepository.get_by_user", Category, filter={"user_id": _SAMPLE_ID}),
+    QueryShape(
+        "CategoryRepository.get_by_name",
+        Category,
+        filter={"user_id": _SAMPLE_ID, "name": "Food"},
+    ),
+    QueryShape(
+        "AIAnalysisRepository.get_cached",
+        AIAnalysisCacheEntry,
+        filter={"user_id": _SAMPLE_ID, "key": "0" * 64, "expires_at": {"$gt": _SAMPLE_DATE}},
+    ),
+    QueryShape("SessionRepository.revoke_user", Session, filter={"user_id": _SAMPLE_ID, "revoked_at": None}),
+    QueryShape(
+        "SessionRepository.revoked_since",
+        Session,
+        filter={"expires_at": {"$gt": _SAMPLE_DATE}, "revoked_at": {"$gte": _SAMPLE_DATE}},
+    ),
+]
+
+
+def _collection_name(model: Type[BaseModel]) -> str:
+    return getattr(model, "__tablename__", model.__name__.lower())
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
+    """Create every declared index. Safe to run on each startup."""
+    for model in INDEXED_MODELS:
+        indexes = getattr(model, "__indexes__", [])
+        if not indexes:
+            continue
+        name = _collection_name(model)
+        try:
+            await db[name].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate data blocking a unique index; keep serving
+            logger.error(f"Failed to create indexes on '{name}': {str(e)}")
+
+
+def _has_collscan(plan: Any) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(v) for v in plan)
+    return False
+
+
+def _winning_plans(explain: Any) -> list[Any]:
+    plans = []
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                plans.append(value)
+            else:
+                plans.extend(_winning_plans(value))
+    elif isinstance(explain, list):
+        for value in explain:
+            plans.extend(_winning_plans(value))
+    return plans
+
+
+async def explain_query_shapes(db: AsyncIOMotorDatabase) -> list[tuple[str, bool]]:
+    """Explain every registered query shape.
+
+    Returns `(name, uses_collscan)` pairs in registry order.
+    """
+    results = []
+    for shape in QUERY_SHAPES:
+        name = _collection_name(shape.model)
+        if shape.pipeline is not None:
+            command = {"aggregate": name, "pipeline": shape.pipeline, "cursor": {}}
+        else:
+            command = {"find": name, "filter": shape.filter or {}}
+            if shape.sort:
+                command["sort"] = shape.sort
+        explain = await db.command(
+            "explain", command, verbosity="queryPlanner", codec_options=db.codec_options
+        )
+        results.append((shape.name, any(_has_collscan(p) for p in _winning_plans(explain))))
+    return results
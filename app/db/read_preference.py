@@ -0,0 +1,29 @@
+from functools import lru_cache
+
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+    _ServerMode,
+)
+
+from app.core.config import settings
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+@lru_cache
+def read_preference_for(method: str) -> _ServerMode:
+    """Read preference configured for a `Repository.method`; primary by default."""
+    mode = settings.MONGODB_READ_PREFERENCES.get(method, "primary")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=settings.MONGODB_MAX_STALENESS_SECONDS)
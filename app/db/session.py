@@ -1,8 +1,115 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
 from app.core.config import settings
+from app.db.codecs import type_registry
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters across every server, for the readiness check."""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        self.waiting -= 1
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.waiting -= 1
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "max_size": settings.MONGODB_MAX_POOL_SIZE,
+            "min_size": settings.MONGODB_MIN_POOL_SIZE,
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "waiting": self.waiting,
+            "checkout_failures": self.checkout_failures,
+        }
+
+
+pool_stats = PoolStats()
+
+client: AsyncIOMotorClient | None = None
+db: AsyncIOMotorDatabase | None = None
+
+
+def create_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+        compressors=settings.MONGODB_COMPRESSORS or None,
+        serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        waitQueueTimeoutMS=settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        uuidRepresentation="standard",
+        type_registry=type_registry,
+        event_listeners=[pool_stats],
+    )
+
+
+def get_client() -> AsyncIOMotorClient:
+    """The shared client, created on first use.
+
+    Creating it opens no connection, so this is safe outside the lifespan,
+    e.g. on serverless platforms or under test clients that skip it.
+    """
+    global client, db
+    if client is None:
+        client = create_client()
+        db = client[settings.MONGODB_DB_NAME]
+    return client
+
+
+async def connect() -> AsyncIOMotorDatabase:
+    """Create the shared client and ping it so the first request finds a warm pool.
+
+    Ping failures propagate; the client stays usable and reconnects on its own.
+    """
+    await get_client().admin.command("ping")
+    return db
+
+
+def close() -> None:
+    global client, db
+    if client is not None:
+        client.close()
+    client = db = None
 
-client = AsyncIOMotorClient(settings.MONGODB_URL)
-db = client[settings.MONGODB_DB_NAME]
 
 async def get_db():
+    # The lifespan normally connects first; without it, connect on first use
+    get_client()
     return db
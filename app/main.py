@@ -1,28 +1,65 @@
+import asyncio
 import time
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError as PydanticValidationError
+from pymongo.errors import PyMongoError
 
 from app.api.v1 import api_router
+from app.core.cache import MongoCacheBackend, response_cache, token_cache, user_cache
 from app.core.config import settings
 from app.core.exceptions import AppError
 from app.core.logging import logger
-from app.core.security_limiter import limiter
+from app.core.rate_limit import MongoRateLimitBackend, rate_limiter
+from app.core.revocation import revoked_sessions
+from app.db.indexes import ensure_indexes
+from app.db import session
+from app.models.rate_limit import RateLimitBucket
+from app.models.response_cache import ResponseCacheEntry
+from app.repositories.session import SessionRepository
 from app.schemas.responses import ErrorResponse
-from slowapi.errors import RateLimitExceeded
-from slowapi import _rate_limit_exceeded_handler
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await session.connect()
+    except PyMongoError as e:
+        if session.db is None:
+            raise
+        # Keep starting; /health/ready reports the database as unavailable
+        logger.error(f"MongoDB ping failed at startup: {str(e)}")
+    db = session.db
+    if settings.MONGODB_ENSURE_INDEXES:
+        try:
+            await ensure_indexes(db)
+        except PyMongoError as e:
+            logger.error(f"Index creation skipped: {str(e)}")
+    if settings.RESPONSE_CACHE_BACKEND == "mongo":
+        response_cache.backend = MongoCacheBackend(
+            db[ResponseCacheEntry.__tablename__], ttl=settings.RESPONSE_CACHE_TTL_SECONDS
+        )
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        rate_limiter.backend = MongoRateLimitBackend(db[RateLimitBucket.__tablename__])
+    revocation_sync = asyncio.create_task(
+        revoked_sessions.sync_forever(
+            SessionRepository(db), settings.SESSION_REVOCATION_SYNC_SECONDS
+        )
+    )
+    yield
+    revocation_sync.cancel()
+    with suppress(asyncio.CancelledError):
+        await revocation_sync
+    session.close()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
-# Rate Limiting
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -49,7 +86,8 @@ async def app_error_handler(request: Request, exc: AppError):
         content=ErrorResponse(
             message=exc.message,
             error={"code": exc.error_code, "data": exc.data}
-        ).model_dump()
+        ).model_dump(),
+        headers=exc.headers,
     )
 
 @app.exception_handler(PydanticValidationError)
@@ -95,3 +133,27 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    pool = session.pool_stats.snapshot()
+    start = time.perf_counter()
+    try:
+        await session.get_client().admin.command("ping")
+    except PyMongoError as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "error": str(e), "pool": pool},
+        )
+    ping_ms = (time.perf_counter() - start) * 1000
+    return {"status": "ready", "ping_ms": round(ping_ms, 2), "pool": pool}
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "response_cache": response_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "revoked_sessions": revoked_sessions.stats(),
+        "rate_limiter": rate_limiter.stats(),
+    }
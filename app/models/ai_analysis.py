@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Any
+import uuid
+from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
+
+class AIAnalysisCacheEntry(BaseModel):
+    """An AI analysis stored under the hash of the expense snapshot it was made from."""
+
+    __tablename__ = "ai_analysis_cache"
+    __indexes__ = [
+        IndexModel([("user_id", ASCENDING), ("key", ASCENDING)], name="user_key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+
+    user_id: uuid.UUID
+    key: str
+    analysis: dict[str, Any]
+    created_at: datetime
+    expires_at: datetime
@@ -1,9 +1,14 @@
 from app.db.base import Base
 import uuid
 from typing import Optional
+from pymongo import ASCENDING, IndexModel
 
 class Category(Base):
     __tablename__ = "categories"
+    __indexes__ = [
+        *Base.__indexes__,
+        IndexModel([("user_id", ASCENDING), ("name", ASCENDING)], name="user_name"),
+    ]
 
     user_id: uuid.UUID
     name: str
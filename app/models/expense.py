@@ -1,11 +1,50 @@
 from datetime import date
 from decimal import Decimal
 from typing import Optional
+import re
 import uuid
+from pydantic import computed_field
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
 from app.db.base import Base
 
+def title_tokens(title: str) -> list[str]:
+    """Lowercased words of a title, as matched by prefix search."""
+    return list(dict.fromkeys(re.findall(r"\w+", title.lower())))
+
 class Expense(Base):
     __tablename__ = "expenses"
+    __indexes__ = [
+        *Base.__indexes__,
+        # Trailing `id` serves the keyset tie-breaker of cursor pagination
+        IndexModel(
+            [("user_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)],
+            name="user_date_id",
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("category", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)],
+            name="user_category_date_id",
+        ),
+        # The other sort orders offered by the expense list
+        IndexModel(
+            [("user_id", ASCENDING), ("amount", DESCENDING), ("id", DESCENDING)],
+            name="user_amount_id",
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("title", ASCENDING), ("id", ASCENDING)],
+            name="user_title_id",
+        ),
+        # Title search, scoped by user; no stemming or stop words
+        IndexModel(
+            [("user_id", ASCENDING), ("title", TEXT)],
+            name="user_title_text",
+            default_language="none",
+        ),
+        # Word-prefix search with an anchored regex on `title_tokens`
+        IndexModel(
+            [("user_id", ASCENDING), ("title_tokens", ASCENDING)],
+            name="user_title_tokens",
+        ),
+    ]
 
     user_id: uuid.UUID
     title: str
@@ -14,3 +53,9 @@ class Expense(Base):
     emotion: Optional[str] = None
     is_avoidable: bool = False
     date: date
+
+    @computed_field
+    @property
+    def title_tokens(self) -> list[str]:
+        # Stored with the document so prefix search can use an index
+        return title_tokens(self.title)
@@ -0,0 +1,26 @@
+from decimal import Decimal
+import uuid
+from pydantic import BaseModel, ConfigDict
+from pymongo import ASCENDING, IndexModel
+
+class ExpenseRollup(BaseModel):
+    """Per-user, per-month, per-category totals maintained on every expense write."""
+
+    __tablename__ = "expense_rollups"
+    __indexes__ = [
+        IndexModel(
+            [("user_id", ASCENDING), ("year", ASCENDING), ("month", ASCENDING), ("category", ASCENDING)],
+            name="user_month_category_unique",
+            unique=True,
+        ),
+    ]
+
+    user_id: uuid.UUID
+    year: int
+    month: int
+    category: str
+    count: int = 0
+    total: Decimal = Decimal("0.00")
+    avoidable_total: Decimal = Decimal("0.00")
+
+    model_config = ConfigDict(from_attributes=True)
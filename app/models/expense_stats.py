@@ -0,0 +1,22 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+import uuid
+from pydantic import BaseModel, ConfigDict
+from pymongo import ASCENDING, IndexModel
+
+class ExpenseUserStats(BaseModel):
+    """Lifetime expense aggregates for one user, updated on every expense write."""
+
+    __tablename__ = "expense_user_stats"
+    __indexes__ = [
+        IndexModel([("user_id", ASCENDING)], name="user_unique", unique=True),
+    ]
+
+    user_id: uuid.UUID
+    lifetime_total: Decimal = Decimal("0.00")
+    lifetime_count: int = 0
+    first_expense_date: Optional[date] = None
+    last_expense_date: Optional[date] = None
+
+    model_config = ConfigDict(from_attributes=True)
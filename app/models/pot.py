@@ -2,6 +2,7 @@ from datetime import date
 from decimal import Decimal
 import enum
 import uuid
+from pymongo import ASCENDING, IndexModel
 from app.db.base import Base
 
 class PotPriority(str, enum.Enum):
@@ -12,6 +13,10 @@ class PotPriority(str, enum.Enum):
 
 class Pot(Base):
     __tablename__ = "pots"
+    __indexes__ = [
+        *Base.__indexes__,
+        IndexModel([("user_id", ASCENDING)], name="user"),
+    ]
 
     user_id: uuid.UUID
     title: str
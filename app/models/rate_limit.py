@@ -0,0 +1,19 @@
+from datetime import datetime
+from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
+
+class RateLimitBucket(BaseModel):
+    """A token bucket held by the shared rate limiter backend."""
+
+    __tablename__ = "rate_limits"
+    __indexes__ = [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        # Set to when the bucket would be full again
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+
+    key: str
+    tokens: float
+    allowed: bool
+    updated_at: datetime
+    expires_at: datetime
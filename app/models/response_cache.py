@@ -0,0 +1,17 @@
+from datetime import datetime
+from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
+
+class ResponseCacheEntry(BaseModel):
+    """A JSON-encoded service result held by the shared response cache backend."""
+
+    __tablename__ = "response_cache"
+    __indexes__ = [
+        IndexModel([("user_id", ASCENDING), ("key", ASCENDING)], name="user_key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+
+    user_id: str
+    key: str
+    value: bytes
+    expires_at: datetime
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+import uuid
+from pymongo import ASCENDING, IndexModel
+from app.db.base import Base
+
+class Session(Base):
+    """A login; its refresh token is rotated on every use."""
+
+    __tablename__ = "sessions"
+    __indexes__ = [
+        *Base.__indexes__,
+        IndexModel([("user_id", ASCENDING)], name="user"),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+        # Every token of the session has expired by then
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]
+
+    user_id: uuid.UUID
+    # `jti` of the only refresh token that may still be used
+    refresh_jti: str
+    # The token `refresh_jti` replaced, still accepted for a short grace window
+    previous_jti: Optional[str] = None
+    rotated_at: Optional[datetime] = None
+    expires_at: datetime
+    revoked_at: Optional[datetime] = None
@@ -1,11 +1,18 @@
 from app.db.base import Base
 from typing import Optional
+from pymongo import ASCENDING, IndexModel
 
 class User(Base):
     __tablename__ = "users"
+    __indexes__ = [
+        *Base.__indexes__,
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ]
 
     email: str
     hashed_password: str
     full_name: Optional[str] = None
     currency: str = "USD"
     is_active: bool = True
+    # Bumped by every expense, pot and category write; drives response ETags
+    data_version: int = 0
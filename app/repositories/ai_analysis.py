@@ -0,0 +1,28 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.models.ai_analysis import AIAnalysisCacheEntry
+from app.repositories.base import BaseRepository
+
+class AIAnalysisRepository(BaseRepository[AIAnalysisCacheEntry]):
+    def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(AIAnalysisCacheEntry, db)
+
+    async def get_cached(self, user_id: uuid.UUID, key: str) -> dict[str, Any] | None:
+        # Expired entries are filtered here since the TTL monitor runs about once a minute
+        doc = await self.collection.find_one(
+            {"user_id": user_id, "key": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+            {"_id": 0, "analysis": 1},
+        )
+        return doc["analysis"] if doc else None
+
+    async def store(
+        self, user_id: uuid.UUID, key: str, analysis: dict[str, Any], ttl: float
+    ) -> None:
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"user_id": user_id, "key": key},
+            {"$set": {"analysis": analysis, "created_at": now, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True,
+        )
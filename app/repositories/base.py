@@ -1,7 +1,10 @@
-from typing import Any, Generic, Sequence, Type, TypeVar
+from typing import Any, Collection, Generic, Sequence, Type, TypeVar
 import uuid
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorCollection, AsyncIOMotorDatabase
 from pydantic import BaseModel
+from pymongo import ReadPreference, ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.db.read_preference import read_preference_for
 
 ModelType = TypeVar("ModelType", bound=BaseModel)
 
@@ -10,14 +13,57 @@ class BaseRepository(Generic[ModelType]):
         self.model = model
         self.db = db
         self.collection_name = getattr(model, "__tablename__", model.__name__.lower())
-        self.collection = self.db[self.collection_name]
+        # Pinned to the primary whatever the connection string says, so
+        # writes and read-after-write always see the latest data
+        self.collection = self.db.get_collection(
+            self.collection_name, read_preference=ReadPreference.PRIMARY
+        )
 
-    async def get(self, id: uuid.UUID) -> ModelType | None:
-        doc = await self.collection.find_one({"id": str(id)})
-        if doc:
+    def _reader(self, method: str) -> AsyncIOMotorCollection:
+        """The collection with the read preference configured for this method."""
+        read_preference = read_preference_for(f"{type(self).__name__}.{method}")
+        if read_preference == ReadPreference.PRIMARY:
+            return self.collection
+        return self.collection.with_options(read_preference=read_preference)
+
+    async def start_session(self) -> AsyncIOMotorClientSession:
+        """A client session, for running several repository calls in one transaction."""
+        return await self.db.client.start_session()
+
+    def _projection(self, fields: Collection[str] | None) -> dict[str, int] | None:
+        if fields is None:
+            return None
+        return {"_id": 0, **{field: 1 for field in fields}}
+
+    def _hydrate(self, doc: dict[str, Any], fields: Collection[str] | None = None) -> ModelType:
+        if fields is None:
             return self.model(**doc)
+        # Partial documents skip validation; the response model validates them
+        return self.model.model_construct(**doc)
+
+    async def get(
+        self, id: uuid.UUID, fields: Collection[str] | None = None
+    ) -> ModelType | None:
+        doc = await self.collection.find_one({"id": id}, self._projection(fields))
+        if doc:
+            return self._hydrate(doc, fields)
         return None
 
+    async def get_many(
+        self, ids: Collection[uuid.UUID], fields: Collection[str] | None = None
+    ) -> list[ModelType]:
+        """Fetch documents by id in one `$in` query.
+
+        Results follow the order of `ids`; missing ids are skipped.
+        """
+        unique_ids = list(dict.fromkeys(ids))
+        if not unique_ids:
+            return []
+        projection = self._projection({*fields, "id"} if fields is not None else None)
+        cursor = self.collection.find({"id": {"$in": unique_ids}}, projection)
+        docs = {doc["id"]: doc for doc in await cursor.to_list(length=len(unique_ids))}
+        return [self._hydrate(docs[id], fields) for id in unique_ids if id in docs]
+
     async def get_multi(
         self, *, skip: int = 0, limit: int = 100
     ) -> Sequence[ModelType]:
@@ -25,51 +71,96 @@ class BaseRepository(Generic[ModelType]):
         docs = await cursor.to_list(length=limit)
         return [self.model(**doc) for doc in docs]
 
-    def _prepare_data(self, data: Any) -> Any:
-        from datetime import date, datetime
-        from decimal import Decimal
-        import uuid
-
-        if isinstance(data, dict):
-            return {k: self._prepare_data(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._prepare_data(v) for v in data]
-        elif isinstance(data, (uuid.UUID, date)):
-            if isinstance(data, datetime):
-                return data  # Keep as datetime object for MongoDB
-            if isinstance(data, date):
-                return datetime.combine(data, datetime.min.time())
-            return str(data)
-        elif isinstance(data, Decimal):
-            return float(data)
-        return data
-
     async def create(self, *, obj_in: dict[str, Any]) -> ModelType:
         # 1. Validate and create instance (adds id, created_at, etc)
         instance = self.model(**obj_in)
         
-        # 2. Convert to MongoDB-friendly data
-        data = self._prepare_data(instance.model_dump())
-            
-        await self.collection.insert_one(data)
+        # 2. Insert; UUIDs, Decimals and dates are encoded by the client's codecs
+        await self.collection.insert_one(instance.model_dump())
         return instance
 
+    async def create_many(
+        self, *, objs_in: Sequence[dict[str, Any]]
+    ) -> tuple[list[ModelType], list[tuple[int, str]]]:
+        """Insert in one unordered batch.
+
+        Returns the created instances and `(index, message)` for each
+        object the server rejected.
+        """
+        instances = [self.model(**obj_in) for obj_in in objs_in]
+        docs = [instance.model_dump() for instance in instances]
+        if not docs:
+            return [], []
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err["errmsg"] for err in e.details.get("writeErrors", [])}
+            created = [inst for i, inst in enumerate(instances) if i not in failed]
+            return created, sorted(failed.items())
+        return instances, []
+
     async def update(
         self, *, db_obj: ModelType, obj_in: dict[str, Any]
     ) -> ModelType:
-        obj_id = str(db_obj.id)
-        
-        # Prepare update data
-        mongo_update_data = self._prepare_data(obj_in)
-        
-        await self.collection.update_one({"id": obj_id}, {"$set": mongo_update_data})
-        doc = await self.collection.find_one({"id": obj_id})
+        await self.collection.update_one({"id": db_obj.id}, {"$set": obj_in})
+        doc = await self.collection.find_one({"id": db_obj.id})
         return self.model(**doc)
 
+    def _owned_filter(
+        self, id: uuid.UUID, user_id: uuid.UUID, filter: dict[str, Any] | None
+    ) -> dict[str, Any]:
+        return {**(filter or {}), "id": id, "user_id": user_id}
+
+    async def update_owned(
+        self,
+        *,
+        id: uuid.UUID,
+        user_id: uuid.UUID,
+        obj_in: dict[str, Any],
+        filter: dict[str, Any] | None = None,
+        return_document: bool = ReturnDocument.AFTER,
+    ) -> ModelType | None:
+        """Update a document owned by `user_id` in one round trip.
+
+        Returns None when nothing matched: the document is missing, belongs
+        to another user or fails `filter`. Callers tell these apart with a
+        follow-up `get` on that path only.
+        """
+        query = self._owned_filter(id, user_id, filter)
+        if not obj_in:
+            doc = await self.collection.find_one(query, {"_id": 0})
+        else:
+            doc = await self.collection.find_one_and_update(
+                query,
+                {"$set": obj_in},
+                projection={"_id": 0},
+                return_document=return_document,
+            )
+        if doc:
+            return self.model(**doc)
+        return None
+
+    async def remove_owned(
+        self,
+        *,
+        id: uuid.UUID,
+        user_id: uuid.UUID,
+        filter: dict[str, Any] | None = None,
+    ) -> ModelType | None:
+        """Delete a document owned by `user_id` in one round trip.
+
+        Returns the deleted document, or None as for `update_owned`.
+        """
+        doc = await self.collection.find_one_and_delete(
+            self._owned_filter(id, user_id, filter), projection={"_id": 0}
+        )
+        if doc:
+            return self.model(**doc)
+        return None
+
     async def remove(self, *, id: uuid.UUID) -> ModelType | None:
-        obj_id = str(id)
-        doc = await self.collection.find_one({"id": obj_id})
+        doc = await self.collection.find_one({"id": id})
         if doc:
-            await self.collection.delete_one({"id": obj_id})
+            await self.collection.delete_one({"id": id})
             return self.model(**doc)
         return None
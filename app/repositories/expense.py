@@ -1,29 +1,62 @@
+import re
 import uuid
 from datetime import date, datetime
-from typing import Sequence
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.models.expense import Expense
+from decimal import Decimal
+from typing import Any, AsyncIterator, Collection, Sequence
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from app.core.config import settings
+from app.core.exceptions import ValidationError
+from app.core.pagination import decode_cursor, encode_cursor, seek_filter
+from app.models.expense import Expense, title_tokens
+from app.models.expense_stats import ExpenseUserStats
 from app.repositories.base import BaseRepository
 
 class ExpenseRepository(BaseRepository[Expense]):
     def __init__(self, db: AsyncIOMotorDatabase):
         super().__init__(Expense, db)
 
-    async def get_multi_by_user(
+    @staticmethod
+    def _build_search_filter(search_query: str, prefix: bool = False) -> dict:
+        """Translate a title search into a text-index query.
+
+        Every term must match. With `prefix`, the last term also matches
+        the start of a word. Queries too short for the text index match
+        as a word prefix. Prefixes are anchored regexes on the indexed
+        `title_tokens`, so they never scan the user's expenses.
+        """
+        terms = re.findall(r"\w+", search_query.lower())
+        if not terms:
+            return {}
+        if len(" ".join(terms)) < settings.EXPENSE_SEARCH_MIN_TEXT_LENGTH:
+            # At most two characters, so a single term
+            return {"title_tokens": {"$regex": f"^{re.escape(terms[0])}"}}
+
+        search = {}
+        if prefix:
+            search["title_tokens"] = {"$regex": f"^{re.escape(terms.pop())}"}
+        if terms:
+            # Quoted terms are ANDed instead of ORed
+            search["$text"] = {"$search": " ".join(f'"{t}"' for t in terms)}
+        return search
+
+    @staticmethod
+    def _with_title_tokens(obj_in: dict[str, Any]) -> dict[str, Any]:
+        if "title" not in obj_in:
+            return obj_in
+        return {**obj_in, "title_tokens": title_tokens(obj_in["title"])}
+
+    def _build_user_query(
         self,
         *,
         user_id: uuid.UUID,
         category: str | None = None,
         avoidable: bool | None = None,
         search_query: str | None = None,
+        search_prefix: bool = False,
         start_date: date | None = None,
         end_date: date | None = None,
-        skip: int = 0,
-        limit: int = 100,
-        sort_by: str = "date",
-        sort_order: int = -1,
-    ) -> tuple[Sequence[Expense], int, float]:
-        query = {"user_id": str(user_id)}
+    ) -> dict:
+        query = {"user_id": user_id}
         
         if category:
             query["category"] = category
@@ -32,7 +65,7 @@ class ExpenseRepository(BaseRepository[Expense]):
             query["is_avoidable"] = avoidable
             
         if search_query:
-            query["title"] = {"$regex": search_query, "$options": "i"}
+            query.update(self._build_search_filter(search_query, search_prefix))
             
         date_filter = {}
         if start_date:
@@ -42,47 +75,283 @@ class ExpenseRepository(BaseRepository[Expense]):
             
         if date_filter:
             query["date"] = date_filter
-            
-        # Use aggregation to get both data and filtered totals in one trip
+        return query
+
+    async def get_multi_by_user(
+        self,
+        *,
+        user_id: uuid.UUID,
+        category: str | None = None,
+        avoidable: bool | None = None,
+        search_query: str | None = None,
+        search_prefix: bool = False,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        skip: int = 0,
+        limit: int = 100,
+        sort_by: str = "date",
+        sort_order: int = -1,
+        cursor: str | None = None,
+        fields: Collection[str] | None = None,
+    ) -> tuple[Sequence[Expense], str | None]:
+        """Return one page of expenses and the cursor of the next page, if any.
+
+        With `fields`, only those fields are fetched and the expenses are
+        returned unvalidated.
+        """
+        query = self._build_user_query(
+            user_id=user_id,
+            category=category,
+            avoidable=avoidable,
+            search_query=search_query,
+            search_prefix=search_prefix,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        projection = None
+        if fields is not None:
+            # The cursor needs the sort key and id even when not requested
+            projection = self._projection({*fields, sort_by, "id"} - {"relevance"})
+        if sort_by == "relevance":
+            if cursor:
+                raise ValidationError(message="Relevance ordering is paged with skip, not cursor")
+            if "$text" in query:
+                projection = {**(projection or {}), "score": {"$meta": "textScore"}}
+                sort = [("score", {"$meta": "textScore"}), ("id", -1)]
+            else:
+                # Short queries go through the regex fallback, which has no score
+                sort = [("date", -1), ("id", -1)]
+        else:
+            # `id` breaks ties so that every row has a unique keyset position
+            sort = [(sort_by, sort_order), ("id", sort_order)]
+
+        if cursor:
+            # Keyset mode: seek past the cursor through the index instead of skipping
+            value, last_id = decode_cursor(cursor, sort_by, sort_order)
+            query = {**query, **seek_filter(sort_by, sort_order, value, last_id)}
+            skip = 0
+
+        # One extra row tells us whether another page exists
+        docs = await (
+            self.collection.find(query, projection)
+            .sort(sort)
+            .skip(skip)
+            .limit(limit + 1)
+            .to_list(length=limit + 1)
+        )
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            if sort_by != "relevance":
+                last = docs[-1]
+                next_cursor = encode_cursor(sort_by, sort_order, last.get(sort_by), last["id"])
+
+        return [self._hydrate(doc, fields) for doc in docs], next_cursor
+
+    async def iter_by_user(
+        self,
+        *,
+        user_id: uuid.UUID,
+        category: str | None = None,
+        avoidable: bool | None = None,
+        search_query: str | None = None,
+        search_prefix: bool = False,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        fields: Collection[str] | None = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Stream raw expense documents, newest first, `batch_size` per round trip."""
+        query = self._build_user_query(
+            user_id=user_id,
+            category=category,
+            avoidable=avoidable,
+            search_query=search_query,
+            search_prefix=search_prefix,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        cursor = (
+            self._reader("iter_by_user")
+            .find(query, self._projection(fields))
+            .sort([("date", -1), ("id", -1)])
+            .batch_size(batch_size)
+        )
+        async for doc in cursor:
+            yield doc
+
+    async def get_recent(self, user_id: uuid.UUID, limit: int = 50) -> Sequence[Expense]:
+        """The user's latest expenses, for analysis."""
+        docs = await (
+            self._reader("get_recent")
+            .find({"user_id": user_id}, {"_id": 0})
+            .sort([("date", -1), ("id", -1)])
+            .limit(limit)
+            .to_list(length=limit)
+        )
+        return [Expense(**doc) for doc in docs]
+
+    def build_bulk_query(
+        self,
+        *,
+        user_id: uuid.UUID,
+        ids: Collection[uuid.UUID] | None = None,
+        **filters: Any,
+    ) -> dict:
+        query = self._build_user_query(user_id=user_id, **filters)
+        if ids is not None:
+            query["id"] = {"$in": list(ids)}
+        return query
+
+    async def get_contributions(
+        self, query: dict, session: AsyncIOMotorClientSession | None = None
+    ) -> list[dict]:
+        """Group matching expenses by rollup bucket and avoidability.
+
+        Each group carries its count, total and first/last date, which is
+        enough to reverse or move its contribution to derived totals.
+        """
         pipeline = [
             {"$match": query},
             {
-                "$facet": {
-                    "data": [
-                        {"$sort": {sort_by: sort_order}},
-                        {"$skip": skip},
-                        {"$limit": limit}
-                    ],
-                    "stats": [
-                        {
-                            "$group": {
-                                "_id": None,
-                                "total_count": {"$sum": 1},
-                                "total_amount": {"$sum": "$amount"},
-                                "total_avoidable_amount": {
-                                    "$sum": {
-                                        "$cond": [{"$eq": ["$is_avoidable", True]}, "$amount", 0]
-                                    }
-                                }
-                            }
+                "$group": {
+                    "_id": {
+                        "year": {"$year": "$date"},
+                        "month": {"$month": "$date"},
+                        "category": "$category",
+                        "is_avoidable": {"$eq": ["$is_avoidable", True]},
+                    },
+                    "count": {"$sum": 1},
+                    "total": {"$sum": "$amount"},
+                    "first_date": {"$min": "$date"},
+                    "last_date": {"$max": "$date"},
+                }
+            },
+        ]
+        groups = await self.collection.aggregate(pipeline, session=session).to_list(length=None)
+        return [{**group.pop("_id"), **group} for group in groups]
+
+    async def update_owned(self, *, obj_in: dict[str, Any], **kwargs: Any) -> Expense | None:
+        return await super().update_owned(obj_in=self._with_title_tokens(obj_in), **kwargs)
+
+    async def update_many_by_query(
+        self,
+        query: dict,
+        obj_in: dict[str, Any],
+        session: AsyncIOMotorClientSession | None = None,
+    ) -> tuple[int, int]:
+        result = await self.collection.update_many(
+            query, {"$set": self._with_title_tokens(obj_in)}, session=session
+        )
+        return result.matched_count, result.modified_count
+
+    async def delete_many_by_query(
+        self, query: dict, session: AsyncIOMotorClientSession | None = None
+    ) -> int:
+        result = await self.collection.delete_many(query, session=session)
+        return result.deleted_count
+
+    async def get_totals(
+        self,
+        *,
+        user_id: uuid.UUID,
+        category: str | None = None,
+        avoidable: bool | None = None,
+        search_query: str | None = None,
+        search_prefix: bool = False,
+        start_date: date | None = None,
+        end_date: date | None = None,
+    ) -> dict:
+        """Count and sum every expense matching the filters."""
+        query = self._build_user_query(
+            user_id=user_id,
+            category=category,
+            avoidable=avoidable,
+            search_query=search_query,
+            search_prefix=search_prefix,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        pipeline = [
+            {"$match": query},
+            {
+                "$group": {
+                    "_id": None,
+                    "total_count": {"$sum": 1},
+                    "total_amount": {"$sum": "$amount"},
+                    "total_avoidable_amount": {
+                        "$sum": {
+                            "$cond": [{"$eq": ["$is_avoidable", True]}, "$amount", 0]
                         }
-                    ]
+                    }
                 }
             }
         ]
-        
-        cursor = self.collection.aggregate(pipeline)
-        result = await cursor.to_list(length=1)
-        
-        facet_result = result[0]
-        expenses = [Expense(**doc) for doc in facet_result["data"]]
-        stats = facet_result["stats"][0] if facet_result["stats"] else {
-            "total_count": 0, 
-            "total_amount": 0.0,
-            "total_avoidable_amount": 0.0
+        result = await self.collection.aggregate(pipeline).to_list(length=1)
+        if not result:
+            return {"total_count": 0, "total_amount": Decimal("0"), "total_avoidable_amount": Decimal("0")}
+        stats = result[0]
+        return {
+            "total_count": stats["total_count"],
+            "total_amount": Decimal(stats["total_amount"]),
+            "total_avoidable_amount": Decimal(stats["total_avoidable_amount"]),
         }
-        
-        return expenses, stats["total_count"], float(stats["total_amount"]), float(stats["total_avoidable_amount"])
+
+    async def get_timeseries(
+        self,
+        user_id: uuid.UUID,
+        start_date: date,
+        end_date: date,
+        bucket: str,
+        group_by: str | None = None,
+    ) -> list[dict]:
+        """Sum expenses per `bucket` (day, week or month) over one date range.
+
+        Only non-empty buckets are returned, ordered by period.
+        """
+        trunc = {"date": "$date", "unit": bucket}
+        if bucket == "week":
+            trunc["startOfWeek"] = "monday"
+        group_id = {"period": {"$dateTrunc": trunc}}
+        if group_by:
+            group_id["key"] = f"${group_by}"
+        pipeline = [
+            {
+                "$match": {
+                    "user_id": user_id,
+                    "date": {
+                        "$gte": datetime.combine(start_date, datetime.min.time()),
+                        "$lte": datetime.combine(end_date, datetime.max.time()),
+                    },
+                }
+            },
+            {
+                "$group": {
+                    "_id": group_id,
+                    "total": {"$sum": "$amount"},
+                    "count": {"$sum": 1},
+                }
+            },
+            {"$sort": {"_id.period": 1}},
+        ]
+        rows = await self._reader("get_timeseries").aggregate(pipeline).to_list(length=None)
+        return [
+            {
+                "period": row["_id"]["period"].date(),
+                "key": row["_id"].get("key"),
+                "total": row["total"],
+                "count": row["count"],
+            }
+            for row in rows
+        ]
+
+    async def get_lifetime_total(self, user_id: uuid.UUID) -> Decimal:
+        """Sum every expense of the user, for when no stats document exists yet."""
+        result = await self._reader("get_lifetime_total").aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$group": {"_id": None, "total": {"$sum": "$amount"}}},
+        ]).to_list(length=1)
+        return result[0]["total"] if result else Decimal("0")
 
     async def get_monthly_summary(
         self, user_id: uuid.UUID, year: int, month: int
@@ -93,65 +362,63 @@ class ExpenseRepository(BaseRepository[Expense]):
         else:
             end_date = datetime(year, month + 1, 1)
 
-        user_id_str = str(user_id)
-        
-        # Aggregation for summary
+        # One round trip: categories are grouped server-side, so at most one
+        # small document per category reaches the $facet, and the lifetime
+        # total is a point lookup on the user's stats document when it exists
         pipeline = [
             {
                 "$match": {
-                    "user_id": user_id_str,
+                    "user_id": user_id,
                     "date": {"$gte": start_date, "$lt": end_date}
                 }
             },
             {
                 "$group": {
-                    "_id": None,
+                    "_id": "$category",
                     "total": {"$sum": "$amount"},
                     "count": {"$sum": 1},
-                    "categories": {"$push": {"category": "$category", "amount": "$amount"}}
                 }
-            }
+            },
+            {
+                "$facet": {
+                    "categories": [{"$sort": {"total": -1}}],
+                    "month": [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "total": {"$sum": "$total"},
+                                "count": {"$sum": "$count"},
+                            }
+                        }
+                    ],
+                }
+            },
+            {
+                "$lookup": {
+                    "from": ExpenseUserStats.__tablename__,
+                    "pipeline": [
+                        {"$match": {"user_id": user_id}},
+                        {"$project": {"_id": 0, "lifetime_total": 1}},
+                    ],
+                    "as": "lifetime",
+                }
+            },
         ]
         
-        cursor = self.collection.aggregate(pipeline)
-        result = await cursor.to_list(length=1)
-        
-        if not result:
-            # Check lifetime total even if no monthly data
-            lifetime_cursor = self.collection.aggregate([
-                {"$match": {"user_id": user_id_str}},
-                {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-            ])
-            lifetime_res = await lifetime_cursor.to_list(length=1)
-            lifetime_total = lifetime_res[0]["total"] if lifetime_res else 0
-            
-            return {
-                "total_amount": 0,
-                "count": 0,
-                "lifetime_total": lifetime_total,
-                "category_breakdown": {}
-            }
-            
+        reader = self._reader("get_monthly_summary")
+        result = await reader.aggregate(pipeline).to_list(length=1)
         summary = result[0]
-        
-        # Calculate lifetime total
-        lifetime_cursor = self.collection.aggregate([
-            {"$match": {"user_id": user_id_str}},
-            {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-        ])
-        lifetime_res = await lifetime_cursor.to_list(length=1)
-        lifetime_total = lifetime_res[0]["total"] if lifetime_res else 0
-        
-        # Calculate category breakdown from the aggregated categories
-        breakdown = {}
-        for entry in summary.get("categories", []):
-            cat = entry["category"]
-            amt = entry["amount"]
-            breakdown[cat] = breakdown.get(cat, 0) + amt
-            
+        month_totals = summary["month"][0] if summary["month"] else {"total": 0, "count": 0}
+        if summary["lifetime"]:
+            lifetime_total = summary["lifetime"][0]["lifetime_total"]
+        else:
+            lifetime_total = await self.get_lifetime_total(user_id)
+
         return {
-            "total_amount": summary["total"],
-            "count": summary["count"],
+            "total_amount": month_totals["total"],
+            "count": month_totals["count"],
             "lifetime_total": lifetime_total,
-            "category_breakdown": breakdown
+            "category_breakdown": {
+                entry["_id"]: entry["total"] for entry in summary["categories"]
+            }
         }
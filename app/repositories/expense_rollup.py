@@ -0,0 +1,119 @@
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Sequence
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReadPreference, UpdateOne
+from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollup
+from app.repositories.base import BaseRepository
+
+# (year, month, category) -> [count, total, avoidable_total]
+RollupDeltas = dict[tuple[int, int, str], list]
+
+
+def add_delta(
+    deltas: RollupDeltas, key: tuple[int, int, str], count: int, total: Decimal, avoidable: bool
+) -> None:
+    entry = deltas.setdefault(key, [0, Decimal("0"), Decimal("0")])
+    entry[0] += count
+    entry[1] += total
+    if avoidable:
+        entry[2] += total
+
+
+def expense_deltas(expenses: Iterable[Expense], sign: int = 1, into: RollupDeltas | None = None) -> RollupDeltas:
+    """Accumulate the rollup contribution of `expenses`, negated when `sign` is -1."""
+    deltas = into if into is not None else {}
+    for expense in expenses:
+        key = (expense.date.year, expense.date.month, expense.category)
+        add_delta(deltas, key, sign, sign * expense.amount, expense.is_avoidable)
+    return deltas
+
+
+class ExpenseRollupRepository(BaseRepository[ExpenseRollup]):
+    def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(ExpenseRollup, db)
+        self.expenses = self.db.get_collection(
+            Expense.__tablename__, read_preference=ReadPreference.PRIMARY
+        )
+
+    async def apply_deltas(self, user_id: uuid.UUID, deltas: RollupDeltas) -> None:
+        """Fold `deltas` into the user's rollups with one unordered bulk write.
+
+        Only buckets that gain expenses are created. A bucket missing on a
+        removal was never built (its expenses predate rollups), and a
+        negative bucket would hide that until the next rebuild.
+        """
+        operations = [
+            UpdateOne(
+                {"user_id": user_id, "year": year, "month": month, "category": category},
+                {"$inc": {"count": count, "total": total, "avoidable_total": avoidable_total}},
+                upsert=count > 0,
+            )
+            for (year, month, category), (count, total, avoidable_total) in deltas.items()
+            if count or total or avoidable_total
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def get_month(
+        self, user_id: uuid.UUID, year: int, month: int
+    ) -> Sequence[ExpenseRollup]:
+        cursor = self._reader("get_month").find(
+            {"user_id": user_id, "year": year, "month": month, "count": {"$gt": 0}},
+            {"_id": 0},
+        )
+        docs = await cursor.to_list(length=None)
+        return [ExpenseRollup(**doc) for doc in docs]
+
+    async def rebuild(self, user_id: uuid.UUID | None = None) -> None:
+        """Recompute rollups from raw expenses, for one user or everyone.
+
+        Buckets are regrouped and merged server-side; buckets that no longer
+        have any expenses are removed afterwards. Writes that land while the
+        rebuild runs may be miscounted, so run it during quiet periods.
+        """
+        scope = {"user_id": user_id} if user_id else {}
+        rebuilt_at = datetime.now(timezone.utc)
+        pipeline = [
+            {"$match": scope},
+            {
+                "$group": {
+                    "_id": {
+                        "user_id": "$user_id",
+                        "year": {"$year": "$date"},
+                        "month": {"$month": "$date"},
+                        "category": "$category",
+                    },
+                    "count": {"$sum": 1},
+                    "total": {"$sum": "$amount"},
+                    "avoidable_total": {
+                        "$sum": {"$cond": [{"$eq": ["$is_avoidable", True]}, "$amount", 0]}
+                    },
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "user_id": "$_id.user_id",
+                    "year": "$_id.year",
+                    "month": "$_id.month",
+                    "category": "$_id.category",
+                    "count": 1,
+                    "total": 1,
+                    "avoidable_total": 1,
+                    "rebuilt_at": {"$literal": rebuilt_at},
+                }
+            },
+            {
+                "$merge": {
+                    "into": self.collection_name,
+                    "on": ["user_id", "year", "month", "category"],
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+        await self.expenses.aggregate(pipeline).to_list(length=None)
+        await self.collection.delete_many({**scope, "rebuilt_at": {"$not": {"$gte": rebuilt_at}}})
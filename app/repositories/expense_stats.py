@@ -0,0 +1,125 @@
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Collection, Sequence
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, ReadPreference, ReturnDocument
+from app.models.expense import Expense
+from app.models.expense_stats import ExpenseUserStats
+from app.repositories.base import BaseRepository
+
+class ExpenseStatsRepository(BaseRepository[ExpenseUserStats]):
+    def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(ExpenseUserStats, db)
+        self.expenses = self.db.get_collection(
+            Expense.__tablename__, read_preference=ReadPreference.PRIMARY
+        )
+
+    async def get_by_user(self, user_id: uuid.UUID) -> ExpenseUserStats | None:
+        doc = await self._reader("get_by_user").find_one({"user_id": user_id}, {"_id": 0})
+        if doc:
+            return ExpenseUserStats(**doc)
+        return None
+
+    async def apply_expenses(
+        self,
+        user_id: uuid.UUID,
+        added: Sequence[Expense] = (),
+        removed: Sequence[Expense] = (),
+    ) -> None:
+        """Fold added and removed expenses into the user's stats document."""
+        added_dates = sorted(e.date for e in added)
+        removed_dates = sorted(e.date for e in removed)
+        total = sum((e.amount for e in added), Decimal("0")) - sum(
+            (e.amount for e in removed), Decimal("0")
+        )
+        if len(added) == len(removed) and not total and added_dates == removed_dates:
+            return
+        await self.apply_delta(
+            user_id,
+            count=len(added) - len(removed),
+            total=total,
+            first_date=added_dates[0] if added_dates else None,
+            last_date=added_dates[-1] if added_dates else None,
+            removed_dates=set(removed_dates) - set(added_dates),
+        )
+
+    async def apply_delta(
+        self,
+        user_id: uuid.UUID,
+        *,
+        count: int,
+        total: Decimal,
+        first_date: date | None = None,
+        last_date: date | None = None,
+        removed_dates: Collection[date] = (),
+    ) -> None:
+        """Apply pre-aggregated changes in one atomic update.
+
+        `first_date`/`last_date` bound the added expenses; `removed_dates`
+        are the dates of removed expenses. A user without a stats document
+        gets one rebuilt from the expenses instead, which already include
+        the change; a delta alone would miss their earlier expenses.
+        """
+        update = {"$inc": {"lifetime_count": count, "lifetime_total": total}}
+        if first_date:
+            update["$min"] = {"first_expense_date": first_date}
+        if last_date:
+            update["$max"] = {"last_expense_date": last_date}
+        doc = await self.collection.find_one_and_update(
+            {"user_id": user_id},
+            update,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            await self.rebuild(user_id)
+            return
+
+        # $min/$max cannot be undone; re-seek a boundary date that was removed
+        stats = ExpenseUserStats(**doc)
+        if {stats.first_expense_date, stats.last_expense_date} & set(removed_dates):
+            await self._refresh_date_bounds(user_id)
+
+    async def _refresh_date_bounds(self, user_id: uuid.UUID) -> None:
+        query = {"user_id": user_id}
+        first = await self.expenses.find_one(query, {"date": 1}, sort=[("date", ASCENDING)])
+        last = await self.expenses.find_one(query, {"date": 1}, sort=[("date", DESCENDING)])
+        await self.collection.update_one(
+            query,
+            {
+                "$set": {
+                    "first_expense_date": first["date"] if first else None,
+                    "last_expense_date": last["date"] if last else None,
+                }
+            },
+        )
+
+    async def rebuild(self, user_id: uuid.UUID | None = None) -> None:
+        """Recompute stats documents from raw expenses, for one user or everyone."""
+        scope = {"user_id": user_id} if user_id else {}
+        rebuilt_at = datetime.now(timezone.utc)
+        pipeline = [
+            {"$match": scope},
+            {
+                "$group": {
+                    "_id": "$user_id",
+                    "lifetime_total": {"$sum": "$amount"},
+                    "lifetime_count": {"$sum": 1},
+                    "first_expense_date": {"$min": "$date"},
+                    "last_expense_date": {"$max": "$date"},
+                }
+            },
+            {"$set": {"user_id": "$_id", "rebuilt_at": {"$literal": rebuilt_at}}},
+            {"$unset": "_id"},
+            {
+                "$merge": {
+                    "into": self.collection_name,
+                    "on": "user_id",
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+        await self.expenses.aggregate(pipeline).to_list(length=None)
+        # Users left without any expenses
+        await self.collection.delete_many({**scope, "rebuilt_at": {"$not": {"$gte": rebuilt_at}}})
@@ -12,7 +12,7 @@ class PotRepository(BaseRepository[Pot]):
         self, *, user_id: uuid.UUID, skip: int = 0, limit: int = 100
     ) -> Sequence[Pot]:
         cursor = (
-            self.collection.find({"user_id": str(user_id)})
+            self.collection.find({"user_id": user_id})
             .skip(skip)
             .limit(limit)
         )
@@ -0,0 +1,91 @@
+import uuid
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from app.core.revocation import revoked_sessions
+from app.models.session import Session
+from app.repositories.base import BaseRepository
+
+class SessionRepository(BaseRepository[Session]):
+    """Every revocation is also added to this process's `revoked_sessions` filter."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(Session, db)
+
+    async def rotate(
+        self, session_id: uuid.UUID, jti: str, new_jti: str, expires_at: datetime
+    ) -> Session | None:
+        """Swap the refresh token `jti` for `new_jti`; None if `jti` is not current."""
+        now = datetime.now(timezone.utc)
+        doc = await self.collection.find_one_and_update(
+            {
+                "id": session_id,
+                "refresh_jti": jti,
+                "revoked_at": None,
+                "expires_at": {"$gt": now},
+            },
+            {
+                "$set": {
+                    "refresh_jti": new_jti,
+                    "previous_jti": jti,
+                    "rotated_at": now,
+                    "expires_at": expires_at,
+                    "updated_at": now,
+                }
+            },
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        return Session(**doc) if doc else None
+
+    async def get_rotated_since(
+        self, session_id: uuid.UUID, jti: str, since: datetime
+    ) -> Session | None:
+        """The live session whose previous refresh token is `jti`, if rotated after `since`."""
+        doc = await self.collection.find_one(
+            {
+                "id": session_id,
+                "previous_jti": jti,
+                "rotated_at": {"$gte": since},
+                "revoked_at": None,
+                "expires_at": {"$gt": datetime.now(timezone.utc)},
+            },
+            {"_id": 0},
+        )
+        return Session(**doc) if doc else None
+
+    async def revoke(self, session_id: uuid.UUID) -> None:
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"id": session_id, "revoked_at": None},
+            {"$set": {"revoked_at": now, "updated_at": now}},
+        )
+        revoked_sessions.add(session_id)
+
+    async def revoke_user(self, user_id: uuid.UUID) -> None:
+        """Revoke every live session of the user, e.g. on logout or password change."""
+        cursor = self.collection.find({"user_id": user_id, "revoked_at": None}, {"_id": 0, "id": 1})
+        ids = [doc["id"] for doc in await cursor.to_list(length=None)]
+        if not ids:
+            return
+        now = datetime.now(timezone.utc)
+        await self.collection.update_many(
+            {"id": {"$in": ids}, "revoked_at": None},
+            {"$set": {"revoked_at": now, "updated_at": now}},
+        )
+        for session_id in ids:
+            revoked_sessions.add(session_id)
+
+    async def is_revoked(self, session_id: uuid.UUID) -> bool:
+        # Most sessions miss the filter and need no round trip
+        if not revoked_sessions.might_contain(session_id):
+            return False
+        doc = await self.collection.find_one({"id": session_id}, {"_id": 0, "revoked_at": 1})
+        return doc is None or doc.get("revoked_at") is not None
+
+    async def revoked_since(self, since: datetime | None) -> list[tuple[uuid.UUID, datetime]]:
+        """Revocations of unexpired sessions, all of them when `since` is None."""
+        query = {"expires_at": {"$gt": datetime.now(timezone.utc)}}
+        query["revoked_at"] = {"$gte": since} if since else {"$ne": None}
+        cursor = self.collection.find(query, {"_id": 0, "id": 1, "revoked_at": 1})
+        return [(doc["id"], doc["revoked_at"]) for doc in await cursor.to_list(length=None)]
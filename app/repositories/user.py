@@ -1,8 +1,13 @@
+import uuid
+from typing import Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core.cache import user_cache
 from app.models.user import User
 from app.repositories.base import BaseRepository
 
 class UserRepository(BaseRepository[User]):
+    """Profile writes drop the user from `user_cache` used by get_current_user."""
+
     def __init__(self, db: AsyncIOMotorDatabase):
         super().__init__(User, db)
 
@@ -11,3 +16,18 @@ class UserRepository(BaseRepository[User]):
         if doc:
             return User(**doc)
         return None
+
+    async def update(self, *, db_obj: User, obj_in: dict[str, Any]) -> User:
+        # Covers profile edits, password changes and resets, and deactivation
+        user = await super().update(db_obj=db_obj, obj_in=obj_in)
+        user_cache.invalidate_user(db_obj.id)
+        return user
+
+    async def get_data_version(self, user_id: uuid.UUID) -> int:
+        """The current data_version, read past `user_cache`, which may hold an older one."""
+        doc = await self.collection.find_one({"id": user_id}, {"_id": 0, "data_version": 1})
+        return doc.get("data_version", 0) if doc else 0
+
+    async def bump_data_version(self, user_id: uuid.UUID) -> None:
+        # Readers use get_data_version, so the cached user can stay
+        await self.collection.update_one({"id": user_id}, {"$inc": {"data_version": 1}})
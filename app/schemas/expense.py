@@ -1,13 +1,16 @@
+import datetime as dt
 import uuid
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional
-from pydantic import BaseModel, Field, ConfigDict, field_validator
+from functools import lru_cache
+from typing import Any, Literal, Optional
+from pydantic import BaseModel, Field, ConfigDict, create_model, field_validator, model_validator
+from app.schemas.types import Amount
 
 
 class ExpenseBase(BaseModel):
     title: str = Field(..., max_length=120)
-    amount: Decimal = Field(..., gt=0)
+    amount: Amount = Field(..., gt=0)
     category: str = Field(..., max_length=50)
     emotion: Optional[str] = Field(None, max_length=50)
     is_avoidable: bool = False
@@ -20,11 +23,21 @@ class ExpenseCreate(ExpenseBase):
 
 class ExpenseUpdate(BaseModel):
     title: Optional[str] = Field(None, max_length=120)
-    amount: Optional[Decimal] = Field(None, gt=0)
+    amount: Optional[Amount] = Field(None, gt=0)
     category: Optional[str] = Field(None, max_length=50)
     emotion: Optional[str] = Field(None, max_length=50)
     is_avoidable: Optional[bool] = None
-    date: Optional[date] = None
+    # Qualified: the default binds `date` to None before the annotation is read
+    date: Optional[dt.date] = None
+
+    @field_validator("title", "amount", "category", "is_avoidable", "date")
+    @classmethod
+    def required_fields_must_not_be_null(cls, v: Any) -> Any:
+        # May be left out, but an explicit null would erase a required value;
+        # `emotion` is optional and may be cleared with null
+        if v is None:
+            raise ValueError("Field may be omitted but not set to null")
+        return v
 
 
 class ExpenseInDB(ExpenseBase):
@@ -41,8 +54,92 @@ class ExpenseSummary(BaseModel):
     lifetime_total: Decimal = Field(default=Decimal('0.00'))
     category_breakdown: dict[str, Decimal]
 
+class ExpenseTimeseriesPoint(BaseModel):
+    period: date
+    total: Decimal
+    count: int
+
+class ExpenseTimeseriesSeries(BaseModel):
+    key: Optional[str]
+    points: list[ExpenseTimeseriesPoint]
+
+class ExpenseTimeseries(BaseModel):
+    bucket: Literal["day", "week", "month"]
+    start: date
+    end: date
+    series: list[ExpenseTimeseriesSeries]
+
 class ExpenseList(BaseModel):
     items: list[ExpenseInDB]
     total_count: int
     total_amount: Decimal
     total_avoidable_amount: Decimal
+    next_cursor: Optional[str] = None
+
+class ExpenseImportError(BaseModel):
+    row: int
+    errors: list[dict[str, Any]]
+
+class ExpenseImportResult(BaseModel):
+    inserted_count: int
+    error_count: int
+    errors: list[ExpenseImportError]
+
+class ExpenseBulkFilter(BaseModel):
+    category: Optional[str] = None
+    avoidable: Optional[bool] = None
+    search_query: Optional[str] = Field(None, max_length=100)
+    search_prefix: bool = False
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+class ExpenseBulkRequest(BaseModel):
+    action: Literal["update", "delete"]
+    ids: Optional[list[uuid.UUID]] = Field(None, min_length=1, max_length=1000)
+    filter: Optional[ExpenseBulkFilter] = None
+    update: Optional[ExpenseUpdate] = None
+
+    @model_validator(mode="after")
+    def check_target_and_action(self) -> "ExpenseBulkRequest":
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide exactly one of ids or filter")
+        if self.filter is not None and not self.filter.model_dump(
+            exclude={"search_prefix"}, exclude_none=True
+        ):
+            # An empty filter would match every expense of the user
+            raise ValueError("filter needs at least one criterion")
+        if self.action == "update" and self.update is None:
+            raise ValueError("update is required for the update action")
+        if self.action == "delete" and self.update is not None:
+            raise ValueError("update is not allowed for the delete action")
+        return self
+
+class ExpenseBulkResult(BaseModel):
+    matched_count: int
+    affected_count: int
+
+
+EXPENSE_FIELDS = frozenset(ExpenseInDB.model_fields)
+
+
+@lru_cache(maxsize=64)
+def expense_fields_model(fields: frozenset[str]) -> type[BaseModel]:
+    """ExpenseInDB narrowed to `fields`, for sparse fieldset responses."""
+    return create_model(
+        "ExpenseFields",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (info.annotation, info)
+            for name, info in ExpenseInDB.model_fields.items()
+            if name in fields
+        },
+    )
+
+
+@lru_cache(maxsize=64)
+def expense_list_fields_model(fields: frozenset[str]) -> type[BaseModel]:
+    return create_model(
+        "ExpenseFieldsList",
+        __base__=ExpenseList,
+        items=(list[expense_fields_model(fields)], ...),
+    )
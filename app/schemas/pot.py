@@ -5,12 +5,13 @@ from typing import Optional
 from pydantic import BaseModel, Field, ConfigDict, field_validator
 
 from app.models.pot import PotPriority
+from app.schemas.types import Amount
 
 
 class PotBase(BaseModel):
     title: str = Field(..., max_length=120)
-    target_amount: Decimal = Field(..., gt=0)
-    current_amount: Decimal = Field(Decimal("0.00"), ge=0)
+    target_amount: Amount = Field(..., gt=0)
+    current_amount: Amount = Field(Decimal("0.00"), ge=0)
     target_date: date
     priority: PotPriority = PotPriority.MEDIUM
 
@@ -26,8 +27,8 @@ class PotCreate(PotBase):
 
 class PotUpdate(BaseModel):
     title: Optional[str] = Field(None, max_length=120)
-    target_amount: Optional[Decimal] = Field(None, gt=0)
-    current_amount: Optional[Decimal] = Field(None, ge=0)
+    target_amount: Optional[Amount] = Field(None, gt=0)
+    current_amount: Optional[Amount] = Field(None, ge=0)
     target_date: Optional[date] = None
     priority: Optional[PotPriority] = None
 
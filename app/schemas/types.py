@@ -0,0 +1,7 @@
+from decimal import Decimal
+from typing import Annotated
+from pydantic import Field
+
+# Money as stored in Decimal128: at most 34 significant digits, which also
+# rules out exponents it cannot represent
+Amount = Annotated[Decimal, Field(max_digits=34)]
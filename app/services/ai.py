@@ -1,14 +1,22 @@
+import hashlib
 import json
 import logging
+import uuid
 from typing import Any, Optional
 import google.generativeai as genai
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel, ValidationError
 
 from app.core.config import settings
 from app.core.exceptions import InternalServerError
+from app.repositories.ai_analysis import AIAnalysisRepository
 
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = "gemini-pro"
+# Bump whenever the prompt changes so that cached analyses are not reused
+PROMPT_VERSION = 1
+
 class AIAnalysisResponse(BaseModel):
     summary: str
     savings_tip: str
@@ -19,15 +27,29 @@ class AIAnalysisResponse(BaseModel):
     savings_potential: float
     risk_level: str
 
+def snapshot_key(expenses_data: list[dict]) -> str:
+    """Hash of the exact data sent for analysis, with the model and prompt version."""
+    canonical = json.dumps(
+        [MODEL_NAME, PROMPT_VERSION, expenses_data], sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
 class AIService:
-    def __init__(self):
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.analysis_repo = AIAnalysisRepository(db)
         if settings.GEMINI_API_KEY:
             genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel("gemini-pro")
+            self.model = genai.GenerativeModel(MODEL_NAME)
         else:
             self.model = None
 
-    async def analyze_expenses(self, expenses_data: list[dict]) -> AIAnalysisResponse:
+    async def analyze_expenses(
+        self, user_id: uuid.UUID, expenses_data: list[dict], force: bool = False
+    ) -> AIAnalysisResponse:
+        """Analyze `expenses_data`, reusing the stored result for an identical snapshot.
+
+        `force` skips the lookup and replaces the stored result.
+        """
         if not self.model:
             # Mock response if no API key
             return AIAnalysisResponse(
@@ -41,6 +63,12 @@ class AIService:
                 risk_level="Unknown"
             )
 
+        key = snapshot_key(expenses_data)
+        if not force:
+            cached = await self.analysis_repo.get_cached(user_id, key)
+            if cached is not None:
+                return AIAnalysisResponse(**cached)
+
         prompt = f"""
         Analyze the following expense data and provide a structured JSON response.
         Data: {json.dumps(expenses_data)}
@@ -59,11 +87,16 @@ class AIService:
         try:
             # Note: This is a simplified call format for the skeleton
             response = await self._call_gemini(prompt)
-            return self._parse_response(response)
+            analysis = self._parse_response(response)
         except Exception as e:
             logger.error(f"AI Service Error: {str(e)}")
             raise InternalServerError(message="Failed to process AI analysis")
 
+        await self.analysis_repo.store(
+            user_id, key, analysis.model_dump(), ttl=settings.AI_ANALYSIS_CACHE_TTL_SECONDS
+        )
+        return analysis
+
     async def _call_gemini(self, prompt: str) -> str:
         # Simplified async call wrapper (genai's generate_content is blocking, 
         # normally would use run_in_executor or specialized async lib)
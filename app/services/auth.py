@@ -1,5 +1,6 @@
 import uuid
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from jose import JWTError
 
@@ -7,6 +8,7 @@ from app.core import security
 from app.core.config import settings
 from app.core.exceptions import UnauthorizedError, ValidationError
 from app.models.user import User
+from app.repositories.session import SessionRepository
 from app.repositories.user import UserRepository
 from app.schemas.user import UserCreate
 from app.schemas.auth import LoginRequest
@@ -14,6 +16,7 @@ from app.schemas.auth import LoginRequest
 class AuthService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.user_repo = UserRepository(db)
+        self.session_repo = SessionRepository(db)
 
     async def register(self, user_in: UserCreate) -> User:
         user = await self.user_repo.get_by_email(user_in.email)
@@ -22,7 +25,7 @@ class AuthService:
         
         obj_in = {
             "email": user_in.email,
-            "hashed_password": security.get_password_hash(user_in.password),
+            "hashed_password": await security.get_password_hash(user_in.password),
             "full_name": user_in.full_name,
             "currency": user_in.currency,
         }
@@ -32,30 +35,87 @@ class AuthService:
         user = await self.user_repo.get_by_email(login_in.email)
         if not user:
             raise UnauthorizedError(message="Incorrect email or password")
-        if not security.verify_password(login_in.password, user.hashed_password):
+        verified, new_hash = await security.verify_and_update_password(
+            login_in.password, user.hashed_password
+        )
+        if not verified:
             raise UnauthorizedError(message="Incorrect email or password")
         if not user.is_active:
             raise UnauthorizedError(message="Inactive user")
+        if new_hash:
+            user = await self.user_repo.update(db_obj=user, obj_in={"hashed_password": new_hash})
         return user
 
-    def create_tokens(self, user_id: str) -> dict[str, str]:
-        access_token = security.create_access_token(subject=user_id)
-        refresh_token = security.create_refresh_token(subject=user_id)
+    def _issue_tokens(self, user_id: uuid.UUID, session_id: uuid.UUID, jti: str) -> dict[str, str]:
         return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
+            "access_token": security.create_access_token(
+                subject=user_id, session_id=str(session_id)
+            ),
+            "refresh_token": security.create_refresh_token(
+                subject=user_id, session_id=str(session_id), token_id=jti
+            ),
         }
 
-    async def refresh_access_token(self, refresh_token: str) -> str:
+    @staticmethod
+    def _session_expiry() -> datetime:
+        return datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+    async def create_tokens(self, user_id: uuid.UUID) -> dict[str, str]:
+        """Open a session and issue its first token pair."""
+        jti = uuid.uuid4().hex
+        session = await self.session_repo.create(
+            obj_in={"user_id": user_id, "refresh_jti": jti, "expires_at": self._session_expiry()}
+        )
+        return self._issue_tokens(user_id, session.id, jti)
+
+    async def refresh_tokens(self, refresh_token: str) -> dict[str, str]:
+        """Rotate the session's refresh token and issue a new token pair.
+
+        A refresh token rotated away less than SESSION_REFRESH_GRACE_SECONDS
+        ago is a concurrent refresh, e.g. from a second tab, and gets the
+        current token again. Presenting it later means it leaked or was
+        replayed, so the whole session is revoked.
+        """
         try:
-            payload = security.decode_token(refresh_token, settings.REFRESH_SECRET_KEY)
-            user_id = payload.get("sub")
-            if not user_id or payload.get("type") != "refresh":
-                raise UnauthorizedError(message="Invalid refresh token")
-            
-            return security.create_access_token(subject=user_id)
+            payload = security.decode_token_cached(refresh_token, settings.REFRESH_SECRET_KEY)
         except JWTError:
             raise UnauthorizedError(message="Could not validate credentials")
+        user_id, session_id, jti = payload.get("sub"), payload.get("sid"), payload.get("jti")
+        if not user_id or not session_id or not jti or payload.get("type") != "refresh":
+            raise UnauthorizedError(message="Invalid refresh token")
+
+        session_id = uuid.UUID(session_id)
+        if await self.session_repo.is_revoked(session_id):
+            raise UnauthorizedError(message="Session revoked")
+        new_jti = uuid.uuid4().hex
+        session = await self.session_repo.rotate(session_id, jti, new_jti, self._session_expiry())
+        if session is None:
+            grace_start = datetime.now(timezone.utc) - timedelta(
+                seconds=settings.SESSION_REFRESH_GRACE_SECONDS
+            )
+            session = await self.session_repo.get_rotated_since(session_id, jti, grace_start)
+            if session is None:
+                await self.session_repo.revoke(session_id)
+                raise UnauthorizedError(message="Refresh token already used")
+            # Rotating again would invalidate the token the other request just got
+            new_jti = session.refresh_jti
+        return self._issue_tokens(session.user_id, session.id, new_jti)
+
+    async def logout(self, access_token: Optional[str], refresh_token: Optional[str]) -> None:
+        """Revoke every session of the user the cookies belong to, if any."""
+        for token, secret in (
+            (refresh_token, settings.REFRESH_SECRET_KEY),
+            (access_token, settings.SECRET_KEY),
+        ):
+            if not token:
+                continue
+            try:
+                user_id = security.decode_token_cached(token, secret).get("sub")
+            except JWTError:
+                continue
+            if user_id:
+                await self.session_repo.revoke_user(uuid.UUID(user_id))
+                return
 
     async def generate_reset_token(self, email: str) -> str:
         user = await self.user_repo.get_by_email(email)
@@ -82,14 +142,18 @@ class AuthService:
             if not user:
                 raise ValidationError(message="User not found")
             
-            hashed_password = security.get_password_hash(new_password)
-            await self.user_repo.update(db_obj=user, obj_in={"hashed_password": hashed_password})
+            await self.set_password(user, new_password)
         except JWTError:
             raise ValidationError(message="Invalid or expired reset token")
 
     async def change_password(self, user: User, current_password: str, new_password: str) -> None:
-        if not security.verify_password(current_password, user.hashed_password):
+        if not await security.verify_password(current_password, user.hashed_password):
             raise ValidationError(message="Incorrect current password")
         
-        hashed_password = security.get_password_hash(new_password)
+        await self.set_password(user, new_password)
+
+    async def set_password(self, user: User, new_password: str) -> None:
+        """Store a new password and sign the user out everywhere."""
+        hashed_password = await security.get_password_hash(new_password)
         await self.user_repo.update(db_obj=user, obj_in={"hashed_password": hashed_password})
+        await self.session_repo.revoke_user(user.id)
@@ -3,16 +3,38 @@ import uuid
 from typing import Sequence
 from app.models.category import Category
 from app.repositories.category import CategoryRepository
+from app.repositories.user import UserRepository
 from app.schemas.category import CategoryCreate, CategoryUpdate
+from app.core.cache import response_cache
 from app.core.exceptions import NotFoundError, ForbiddenError
 
 class CategoryService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.category_repo = CategoryRepository(Category, db)
+        self.user_repo = UserRepository(db)
 
-    async def get_categories(self, user_id: uuid.UUID) -> Sequence[Category]:
+    async def get_categories(
+        self, user_id: uuid.UUID, data_version: int | None = None
+    ) -> Sequence[Category]:
         # Return user's categories. We could also include default categories here.
-        return await self.category_repo.get_by_user(user_id)
+        if data_version is None:
+            data_version = await self.user_repo.get_data_version(user_id)
+        key = response_cache.key("categories", data_version)
+        categories = await response_cache.get(user_id, key, list[Category])
+        if categories is None:
+            categories = await self.category_repo.get_by_user(user_id)
+            await response_cache.set(user_id, key, categories, list[Category])
+        return categories
+
+    async def _check_access(
+        self, category_id: uuid.UUID, user_id: uuid.UUID, action: str
+    ) -> Category:
+        category = await self.category_repo.get(category_id)
+        if not category:
+            raise NotFoundError(message="Category not found")
+        if str(category.user_id) != str(user_id):
+            raise ForbiddenError(message=f"Not authorized to {action} this category")
+        return category
 
     async def create_category(self, user_id: uuid.UUID, category_in: CategoryCreate) -> Category:
         # Check if category with same name already exists
@@ -21,29 +43,36 @@ class CategoryService:
             return existing
             
         obj_in = category_in.model_dump()
-        obj_in["user_id"] = str(user_id)
+        obj_in["user_id"] = user_id
         obj_in["is_default"] = False
-        return await self.category_repo.create(obj_in=obj_in)
+        category = await self.category_repo.create(obj_in=obj_in)
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+        return category
 
     async def update_category(
         self, category_id: uuid.UUID, user_id: uuid.UUID, category_in: CategoryUpdate
     ) -> Category:
-        category = await self.category_repo.get(category_id)
+        update_data = category_in.model_dump(exclude_unset=True)
+        category = await self.category_repo.update_owned(
+            id=category_id, user_id=user_id, obj_in=update_data
+        )
         if not category:
+            await self._check_access(category_id, user_id, "update")
+            # Owned yet unmatched: it changed under us, e.g. a concurrent delete
             raise NotFoundError(message="Category not found")
-        if str(category.user_id) != str(user_id):
-            raise ForbiddenError(message="Not authorized to update this category")
-        
-        update_data = category_in.model_dump(exclude_unset=True)
-        return await self.category_repo.update(db_obj=category, obj_in=update_data)
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+        return category
 
     async def delete_category(self, category_id: uuid.UUID, user_id: uuid.UUID) -> None:
-        category = await self.category_repo.get(category_id)
-        if not category:
+        deleted = await self.category_repo.remove_owned(
+            id=category_id, user_id=user_id, filter={"is_default": {"$ne": True}}
+        )
+        if not deleted:
+            category = await self._check_access(category_id, user_id, "delete")
+            if category.is_default:
+                raise ForbiddenError(message="Cannot delete default categories")
             raise NotFoundError(message="Category not found")
-        if str(category.user_id) != str(user_id):
-            raise ForbiddenError(message="Not authorized to delete this category")
-        if category.is_default:
-            raise ForbiddenError(message="Cannot delete default categories")
-            
-        await self.category_repo.remove(id=category_id)
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
@@ -1,65 +1,418 @@
+import asyncio
+import csv
+import io
+import json
+import logging
 import uuid
-from datetime import date
-from typing import Sequence
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import IO, Any, AsyncIterator, Collection, Iterable, Iterator, Sequence
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from typing_extensions import TypedDict
+from pydantic import ValidationError as PydanticValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
 
-from app.core.exceptions import NotFoundError, ForbiddenError
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.exceptions import AppError, NotFoundError, ForbiddenError, ValidationError
 from app.models.expense import Expense
 from app.repositories.expense import ExpenseRepository
-from app.schemas.expense import ExpenseCreate, ExpenseUpdate
+from app.repositories.expense_rollup import (
+    ExpenseRollupRepository,
+    RollupDeltas,
+    add_delta,
+    expense_deltas,
+)
+from app.repositories.expense_stats import ExpenseStatsRepository
+from app.repositories.user import UserRepository
+from app.schemas.expense import (
+    ExpenseBulkRequest,
+    ExpenseCreate,
+    ExpenseList,
+    ExpenseSummary,
+    ExpenseTimeseries,
+    ExpenseUpdate,
+    expense_list_fields_model,
+)
+
+logger = logging.getLogger(__name__)
+
+# Server error code for transactions on a standalone mongod
+ILLEGAL_OPERATION = 20
+
+# (row number, parsed row or None when the row could not be parsed)
+ImportRow = tuple[int, Any]
+
+def iter_csv_rows(stream: IO[bytes]) -> Iterator[ImportRow]:
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        # Blank cells fall back to the schema defaults
+        yield reader.line_num, {
+            key.strip(): value for key, value in row.items() if key and value not in (None, "")
+        }
+
+def iter_ndjson_rows(stream: IO[bytes]) -> Iterator[ImportRow]:
+    for line_num, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8-sig"), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError:
+            yield line_num, None
+
+class ExpenseTotals(TypedDict):
+    total_count: int
+    total_amount: Decimal
+    total_avoidable_amount: Decimal
+
+# Expense fields that feed rollups and lifetime stats
+TOTALS_FIELDS = {"amount", "date", "category", "is_avoidable"}
+
+EXPORT_FIELDS = ["id", "title", "amount", "category", "emotion", "is_avoidable", "date", "created_at"]
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # Expense dates are stored as midnight datetimes
+        if value.time() == datetime.min.time() and value.tzinfo is None:
+            return value.date().isoformat()
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+def _bucket_start(day: date, bucket: str) -> date:
+    """The start of the bucket holding `day`, matching $dateTrunc."""
+    if bucket == "month":
+        return day.replace(day=1)
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def _bucket_count(start: date, end: date, bucket: str) -> int:
+    first, last = _bucket_start(start, bucket), _bucket_start(end, bucket)
+    if bucket == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days // (7 if bucket == "week" else 1) + 1
+
+def _bucket_periods(start: date, end: date, bucket: str) -> list[date]:
+    """Every bucket start between `start` and `end`.
+
+    Stops at the last bucket instead of stepping past it, so ranges ending
+    near `date.max` do not overflow.
+    """
+    current, last = _bucket_start(start, bucket), _bucket_start(end, bucket)
+    periods = [current]
+    while current < last:
+        if bucket == "month":
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        else:
+            current += timedelta(days=7 if bucket == "week" else 1)
+        periods.append(current)
+    return periods
 
 class ExpenseService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.expense_repo = ExpenseRepository(db)
+        self.rollup_repo = ExpenseRollupRepository(db)
+        self.stats_repo = ExpenseStatsRepository(db)
+        self.user_repo = UserRepository(db)
 
     async def create_expense(
         self, user_id: uuid.UUID, expense_in: ExpenseCreate
     ) -> Expense:
         obj_in = expense_in.model_dump()
-        obj_in["user_id"] = str(user_id)
-        return await self.expense_repo.create(obj_in=obj_in)
+        obj_in["user_id"] = user_id
+        expense = await self.expense_repo.create(obj_in=obj_in)
+        await asyncio.gather(
+            self.rollup_repo.apply_deltas(user_id, expense_deltas([expense])),
+            self.stats_repo.apply_expenses(user_id, added=[expense]),
+        )
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+        return expense
+
+    async def import_expenses(
+        self, user_id: uuid.UUID, rows: Iterable[ImportRow]
+    ) -> dict:
+        """Validate rows one by one and insert the valid ones in unordered batches.
+
+        Rollups and lifetime stats are updated once for the whole import.
+        """
+        result = {"inserted_count": 0, "error_count": 0, "errors": []}
+        deltas: RollupDeltas = {}
+        stats = {"count": 0, "total": Decimal("0"), "first_date": None, "last_date": None}
+
+        def record_error(row_number: int, errors: list[dict]) -> None:
+            result["error_count"] += 1
+            if len(result["errors"]) < settings.EXPENSE_IMPORT_MAX_REPORTED_ERRORS:
+                result["errors"].append({"row": row_number, "errors": errors})
+
+        async def flush(batch: list[tuple[int, dict]]) -> None:
+            created, failed = await self.expense_repo.create_many(objs_in=[obj for _, obj in batch])
+            for index, message in failed:
+                record_error(batch[index][0], [{"field": None, "message": message}])
+            expense_deltas(created, into=deltas)
+            for expense in created:
+                stats["count"] += 1
+                stats["total"] += expense.amount
+                if stats["first_date"] is None or expense.date < stats["first_date"]:
+                    stats["first_date"] = expense.date
+                if stats["last_date"] is None or expense.date > stats["last_date"]:
+                    stats["last_date"] = expense.date
+            result["inserted_count"] += len(created)
+
+        batch = []
+        try:
+            for row_number, row in rows:
+                if row is None:
+                    record_error(row_number, [{"field": None, "message": "Malformed row"}])
+                    continue
+                try:
+                    expense_in = ExpenseCreate.model_validate(row)
+                except PydanticValidationError as e:
+                    record_error(row_number, [
+                        {"field": ".".join(str(p) for p in err["loc"]), "message": err["msg"]}
+                        for err in e.errors()
+                    ])
+                    continue
+                obj_in = expense_in.model_dump()
+                obj_in["user_id"] = user_id
+                batch.append((row_number, obj_in))
+                if len(batch) >= settings.EXPENSE_IMPORT_BATCH_SIZE:
+                    await flush(batch)
+                    batch = []
+            await flush(batch)
+        except UnicodeDecodeError:
+            raise ValidationError(message="Import file must be UTF-8 encoded", data=result)
+        finally:
+            # Whatever was inserted, even before a failure, must be reflected
+            if result["inserted_count"]:
+                await asyncio.gather(
+                    self.rollup_repo.apply_deltas(user_id, deltas),
+                    self.stats_repo.apply_delta(user_id, **stats),
+                )
+                await self.user_repo.bump_data_version(user_id)
+                await response_cache.invalidate_user(user_id)
+        result["errors"].sort(key=lambda e: e["row"])
+        return result
+
+    async def export_expenses(
+        self, user_id: uuid.UUID, format: str, **filters: Any
+    ) -> AsyncIterator[str]:
+        """Yield the user's expenses as CSV or NDJSON text, one chunk per batch."""
+        batch_size = settings.EXPENSE_EXPORT_BATCH_SIZE
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if format == "csv":
+            writer.writerow(EXPORT_FIELDS)
+
+        rows = 0
+        async for doc in self.expense_repo.iter_by_user(
+            user_id=user_id, fields=EXPORT_FIELDS, batch_size=batch_size, **filters
+        ):
+            values = [_export_value(doc.get(field)) for field in EXPORT_FIELDS]
+            if format == "csv":
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values))) + "\n")
+            rows += 1
+            if rows % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    async def bulk_expenses(
+        self, user_id: uuid.UUID, bulk_in: ExpenseBulkRequest
+    ) -> dict:
+        """Update or delete many of the user's expenses in one owner-scoped write."""
+        filters = bulk_in.filter.model_dump() if bulk_in.filter else {}
+        query = self.expense_repo.build_bulk_query(user_id=user_id, ids=bulk_in.ids, **filters)
+        update_data = bulk_in.update.model_dump(exclude_unset=True) if bulk_in.update else {}
+        if bulk_in.action == "update" and not update_data:
+            raise ValidationError(message="No fields to update")
+
+        # Capture what the matched expenses contribute before changing them,
+        # in one transaction so that no concurrent write lands in between
+        needs_contributions = bulk_in.action == "delete" or bool(update_data.keys() & TOTALS_FIELDS)
+
+        async def write(
+            session: AsyncIOMotorClientSession | None = None,
+        ) -> tuple[list[dict], int, int]:
+            groups = []
+            if needs_contributions:
+                groups = await self.expense_repo.get_contributions(query, session=session)
+            if bulk_in.action == "delete":
+                matched = affected = await self.expense_repo.delete_many_by_query(query, session=session)
+            else:
+                matched, affected = await self.expense_repo.update_many_by_query(
+                    query, update_data, session=session
+                )
+            return groups, matched, affected
+
+        if not needs_contributions:
+            groups, matched, affected = await write()
+        else:
+            try:
+                async with await self.expense_repo.start_session() as session:
+                    groups, matched, affected = await session.with_transaction(write)
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                # Standalone servers have no transactions. A write racing this one
+                # can then skew rollups and stats until rebuild_rollups.py runs.
+                logger.warning(f"Bulk {bulk_in.action} for user {user_id} ran without a transaction")
+                groups, matched, affected = await write()
+
+        if groups and matched:
+            await self._apply_bulk_contributions(user_id, groups, bulk_in.action, update_data)
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+        return {"matched_count": matched, "affected_count": affected}
+
+    async def _apply_bulk_contributions(
+        self, user_id: uuid.UUID, groups: list[dict], action: str, update_data: dict
+    ) -> None:
+        deltas: RollupDeltas = {}
+        total_delta = Decimal("0")
+        count_delta = 0
+        new_date = update_data.get("date")
+        old_first = min(g["first_date"] for g in groups).date()
+        old_last = max(g["last_date"] for g in groups).date()
+
+        for group in groups:
+            total = Decimal(str(group["total"]))
+            add_delta(
+                deltas,
+                (group["year"], group["month"], group["category"]),
+                -group["count"],
+                -total,
+                group["is_avoidable"],
+            )
+            if action == "delete":
+                count_delta -= group["count"]
+                total_delta -= total
+                continue
+
+            new_total = update_data["amount"] * group["count"] if "amount" in update_data else total
+            year, month = (new_date.year, new_date.month) if new_date else (group["year"], group["month"])
+            add_delta(
+                deltas,
+                (year, month, update_data.get("category", group["category"])),
+                group["count"],
+                new_total,
+                update_data.get("is_avoidable", group["is_avoidable"]),
+            )
+            total_delta += new_total - total
+
+        moved_dates = action == "delete" or new_date is not None
+        await asyncio.gather(
+            self.rollup_repo.apply_deltas(user_id, deltas),
+            self.stats_repo.apply_delta(
+                user_id,
+                count=count_delta,
+                total=total_delta,
+                first_date=new_date,
+                last_date=new_date,
+                removed_dates={old_first, old_last} if moved_dates else (),
+            ),
+        )
 
     async def get_expense(
-        self, expense_id: uuid.UUID, user_id: uuid.UUID
+        self,
+        expense_id: uuid.UUID,
+        user_id: uuid.UUID,
+        fields: Collection[str] | None = None,
     ) -> Expense:
-        expense = await self.expense_repo.get(expense_id)
+        if fields is not None:
+            # Ownership is checked even when user_id is not requested
+            fields = {*fields, "user_id"}
+        expense = await self.expense_repo.get(expense_id, fields=fields)
         if not expense:
             raise NotFoundError(message="Expense not found")
         if str(expense.user_id) != str(user_id):
             raise ForbiddenError(message="Not authorized to access this expense")
         return expense
 
+    async def _ownership_error(self, expense_id: uuid.UUID, action: str) -> AppError:
+        # Only reached when an owner-scoped write matched nothing
+        if await self.expense_repo.get(expense_id, fields=["id"]):
+            return ForbiddenError(message=f"Not authorized to {action} this expense")
+        return NotFoundError(message="Expense not found")
+
     async def get_expenses(
         self,
         user_id: uuid.UUID,
         category: str | None = None,
         avoidable: bool | None = None,
         search_query: str | None = None,
+        search_prefix: bool = False,
         start_date: date | None = None,
         end_date: date | None = None,
         skip: int = 0,
         limit: int = 100,
         sort_by: str = "date",
         sort_order: int = -1,
-    ) -> dict:
-        expenses, total_count, total_amount, total_avoidable = await self.expense_repo.get_multi_by_user(
+        cursor: str | None = None,
+        fields: Collection[str] | None = None,
+        data_version: int | None = None,
+    ) -> ExpenseList:
+        """A page of expenses with the totals of every match.
+
+        Returns `expense_list_fields_model(fields)` when `fields` is set.
+        Cache keys include the user's `data_version` (read here unless the
+        caller already has it), so entries from before a write are unreachable.
+        """
+        filters = {
+            "category": category,
+            "avoidable": avoidable,
+            "search_query": search_query,
+            "search_prefix": search_prefix,
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        if data_version is None:
+            data_version = await self.user_repo.get_data_version(user_id)
+        key = response_cache.key(
+            "expenses", data_version, *filters.items(), skip, limit, sort_by, sort_order, cursor,
+            tuple(sorted(fields)) if fields else None,
+        )
+        list_model = ExpenseList if fields is None else expense_list_fields_model(frozenset(fields))
+        cached = await response_cache.get(user_id, key, list_model)
+        if cached is not None:
+            return cached
+
+        page = self.expense_repo.get_multi_by_user(
             user_id=user_id,
-            category=category,
-            avoidable=avoidable,
-            search_query=search_query,
-            start_date=start_date,
-            end_date=end_date,
             skip=skip,
             limit=limit,
             sort_by=sort_by,
             sort_order=sort_order,
+            cursor=cursor,
+            fields=fields,
+            **filters,
         )
-        return {
+
+        # Totals only change on writes, so later pages reuse the first page's
+        totals_key = response_cache.key("expense_totals", data_version, *filters.items())
+        is_first_page = not cursor and skip == 0
+        totals = None if is_first_page else await response_cache.get(user_id, totals_key, ExpenseTotals)
+        if totals is None:
+            (expenses, next_cursor), totals = await asyncio.gather(
+                page, self.expense_repo.get_totals(user_id=user_id, **filters)
+            )
+            await response_cache.set(user_id, totals_key, totals, ExpenseTotals)
+        else:
+            expenses, next_cursor = await page
+
+        result = list_model.model_validate({
             "items": expenses,
-            "total_count": total_count,
-            "total_amount": total_amount,
-            "total_avoidable_amount": total_avoidable
-        }
+            **totals,
+            "next_cursor": next_cursor,
+        })
+        await response_cache.set(user_id, key, result, list_model)
+        return result
 
     async def update_expense(
         self,
@@ -67,17 +420,124 @@ class ExpenseService:
         user_id: uuid.UUID,
         expense_in: ExpenseUpdate
     ) -> Expense:
-        expense = await self.get_expense(expense_id, user_id)
         update_data = expense_in.model_dump(exclude_unset=True)
-        return await self.expense_repo.update(db_obj=expense, obj_in=update_data)
+        # The previous version is needed to move its rollup contribution
+        expense = await self.expense_repo.update_owned(
+            id=expense_id,
+            user_id=user_id,
+            obj_in=update_data,
+            return_document=ReturnDocument.BEFORE,
+        )
+        if not expense:
+            raise await self._ownership_error(expense_id, "update")
+        updated = expense.model_copy(update=update_data)
+        deltas = expense_deltas([expense], sign=-1)
+        await asyncio.gather(
+            self.rollup_repo.apply_deltas(user_id, expense_deltas([updated], into=deltas)),
+            self.stats_repo.apply_expenses(user_id, added=[updated], removed=[expense]),
+        )
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+        return updated
 
     async def delete_expense(
         self, expense_id: uuid.UUID, user_id: uuid.UUID
     ) -> None:
-        await self.get_expense(expense_id, user_id)
-        await self.expense_repo.remove(id=expense_id)
+        expense = await self.expense_repo.remove_owned(id=expense_id, user_id=user_id)
+        if not expense:
+            raise await self._ownership_error(expense_id, "delete")
+        await asyncio.gather(
+            self.rollup_repo.apply_deltas(user_id, expense_deltas([expense], sign=-1)),
+            self.stats_repo.apply_expenses(user_id, removed=[expense]),
+        )
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+
+    async def get_recent_expenses(
+        self, user_id: uuid.UUID, limit: int = 50
+    ) -> Sequence[Expense]:
+        return await self.expense_repo.get_recent(user_id, limit)
+
+    async def get_timeseries(
+        self,
+        user_id: uuid.UUID,
+        start_date: date,
+        end_date: date,
+        bucket: str = "month",
+        group_by: str | None = None,
+        data_version: int | None = None,
+    ) -> ExpenseTimeseries:
+        if end_date < start_date:
+            raise ValidationError(message="end must not be before start")
+        # Counted from the dates, so an oversized range never builds its periods
+        if _bucket_count(start_date, end_date, bucket) > settings.EXPENSE_TIMESERIES_MAX_BUCKETS:
+            raise ValidationError(
+                message=f"Too many {bucket} buckets; use a larger bucket or a shorter range",
+                data={"max_buckets": settings.EXPENSE_TIMESERIES_MAX_BUCKETS},
+            )
+        periods = _bucket_periods(start_date, end_date, bucket)
+
+        if data_version is None:
+            data_version = await self.user_repo.get_data_version(user_id)
+        key = response_cache.key("expense_timeseries", data_version, start_date, end_date, bucket, group_by)
+        cached = await response_cache.get(user_id, key, ExpenseTimeseries)
+        if cached is not None:
+            return cached
+
+        rows = await self.expense_repo.get_timeseries(
+            user_id, start_date, end_date, bucket, group_by
+        )
+
+        # Zero-fill so that every series has one point per period
+        totals: dict[str, dict[date, dict]] = {}
+        for row in rows:
+            series_key = row["key"] if group_by else "total"
+            totals.setdefault(series_key, {})[row["period"]] = row
+        empty = {"total": Decimal("0"), "count": 0}
+        series = [
+            {
+                "key": series_key,
+                "points": [
+                    {"period": period, **{k: points.get(period, empty)[k] for k in empty}}
+                    for period in periods
+                ],
+            }
+            for series_key, points in sorted(totals.items(), key=lambda item: str(item[0]))
+        ]
+        if not series and not group_by:
+            series = [{"key": "total", "points": [{"period": p, **empty} for p in periods]}]
+        result = ExpenseTimeseries(bucket=bucket, start=start_date, end=end_date, series=series)
+        await response_cache.set(user_id, key, result, ExpenseTimeseries)
+        return result
 
     async def get_monthly_summary(
-        self, user_id: uuid.UUID, year: int, month: int
-    ) -> dict:
-        return await self.expense_repo.get_monthly_summary(user_id, year, month)
+        self, user_id: uuid.UUID, year: int, month: int, data_version: int | None = None
+    ) -> ExpenseSummary:
+        if data_version is None:
+            data_version = await self.user_repo.get_data_version(user_id)
+        key = response_cache.key("expense_summary", data_version, year, month)
+        cached = await response_cache.get(user_id, key, ExpenseSummary)
+        if cached is not None:
+            return cached
+
+        if not settings.EXPENSE_ROLLUPS_ENABLED:
+            summary = await self.expense_repo.get_monthly_summary(user_id, year, month)
+        else:
+            rollups, stats = await asyncio.gather(
+                self.rollup_repo.get_month(user_id, year, month),
+                self.stats_repo.get_by_user(user_id),
+            )
+            if stats:
+                lifetime_total = stats.lifetime_total
+            else:
+                # No stats document yet, e.g. before rebuild_rollups.py ran
+                lifetime_total = await self.expense_repo.get_lifetime_total(user_id)
+            summary = {
+                "total_amount": sum((r.total for r in rollups), Decimal("0")),
+                "count": sum(r.count for r in rollups),
+                "lifetime_total": lifetime_total,
+                "category_breakdown": {r.category: r.total for r in rollups},
+            }
+        result = ExpenseSummary(**summary)
+        await response_cache.set(user_id, key, result, ExpenseSummary)
+        return result
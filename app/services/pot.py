@@ -3,19 +3,25 @@ from decimal import Decimal
 from typing import Sequence
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from app.core.cache import response_cache
 from app.core.exceptions import NotFoundError, ForbiddenError, ValidationError
 from app.models.pot import Pot
 from app.repositories.pot import PotRepository
+from app.repositories.user import UserRepository
 from app.schemas.pot import PotCreate, PotUpdate
 
 class PotService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.pot_repo = PotRepository(db)
+        self.user_repo = UserRepository(db)
 
     async def create_pot(self, user_id: uuid.UUID, pot_in: PotCreate) -> Pot:
         obj_in = pot_in.model_dump()
-        obj_in["user_id"] = str(user_id)
-        return await self.pot_repo.create(obj_in=obj_in)
+        obj_in["user_id"] = user_id
+        pot = await self.pot_repo.create(obj_in=obj_in)
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+        return pot
 
     async def get_pot(self, pot_id: uuid.UUID, user_id: uuid.UUID) -> Pot:
         pot = await self.pot_repo.get(pot_id)
@@ -26,32 +32,65 @@ class PotService:
         return pot
 
     async def get_pots(
-        self, user_id: uuid.UUID, skip: int = 0, limit: int = 100
+        self,
+        user_id: uuid.UUID,
+        skip: int = 0,
+        limit: int = 100,
+        data_version: int | None = None,
     ) -> Sequence[Pot]:
-        return await self.pot_repo.get_multi_by_user(
-            user_id=user_id, skip=skip, limit=limit
-        )
+        if data_version is None:
+            data_version = await self.user_repo.get_data_version(user_id)
+        key = response_cache.key("pots", data_version, skip, limit)
+        pots = await response_cache.get(user_id, key, list[Pot])
+        if pots is None:
+            pots = await self.pot_repo.get_multi_by_user(
+                user_id=user_id, skip=skip, limit=limit
+            )
+            await response_cache.set(user_id, key, pots, list[Pot])
+        return pots
 
     async def update_pot(
         self, pot_id: uuid.UUID, user_id: uuid.UUID, pot_in: PotUpdate
     ) -> Pot:
-        pot = await self.get_pot(pot_id, user_id)
         update_data = pot_in.model_dump(exclude_unset=True)
         
-        # Prevent current_amount from exceeding target_amount
+        # Prevent current_amount from exceeding target_amount; against the
+        # stored goal this is checked atomically by the update filter
+        condition = None
         if "current_amount" in update_data:
             new_amount = update_data["current_amount"]
-            if new_amount > pot.target_amount:
-                raise ValidationError(
-                    message=f"Total amount cannot exceed your goal of {pot.target_amount}",
-                    data={"target_amount": float(pot.target_amount)}
-                )
+            if "target_amount" in update_data:
+                if new_amount > update_data["target_amount"]:
+                    raise self._goal_exceeded(update_data["target_amount"])
+            else:
+                condition = {"target_amount": {"$gte": new_amount}}
 
-        return await self.pot_repo.update(db_obj=pot, obj_in=update_data)
+        updated = await self.pot_repo.update_owned(
+            id=pot_id, user_id=user_id, obj_in=update_data, filter=condition
+        )
+        if not updated:
+            # Raises 404/403 unless only the goal condition failed
+            pot = await self.get_pot(pot_id, user_id)
+            raise self._goal_exceeded(pot.target_amount)
+        pot = updated
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+        return pot
 
     async def delete_pot(self, pot_id: uuid.UUID, user_id: uuid.UUID) -> None:
-        await self.get_pot(pot_id, user_id)
-        await self.pot_repo.remove(id=pot_id)
+        if not await self.pot_repo.remove_owned(id=pot_id, user_id=user_id):
+            await self.get_pot(pot_id, user_id)
+            # Owned yet unmatched: deleted concurrently
+            raise NotFoundError(message="Pot not found")
+        await self.user_repo.bump_data_version(user_id)
+        await response_cache.invalidate_user(user_id)
+
+    @staticmethod
+    def _goal_exceeded(target_amount: Decimal) -> ValidationError:
+        return ValidationError(
+            message=f"Total amount cannot exceed your goal of {target_amount}",
+            data={"target_amount": float(target_amount)}
+        )
 
     @staticmethod
     def calculate_progress(pot: Pot) -> dict:
@@ -0,0 +1,63 @@
+"""Store `title_tokens` on expenses written before prefix search used them.
+
+Prefix search matches an anchored regex against the indexed `title_tokens`
+array, which every expense write now maintains. Until an expense is
+backfilled, prefix searches do not find it. Each pass only selects
+expenses without tokens, so the backfill can be interrupted and re-run.
+
+Usage: python backfill_title_tokens.py [--batch-size 1000] [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from pymongo import UpdateOne
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.db import session
+from app.models.expense import Expense, title_tokens
+
+
+async def main(batch_size: int, dry_run: bool) -> None:
+    db = await session.connect()
+    collection = db[Expense.__tablename__]
+    query = {"title_tokens": {"$exists": False}}
+    print(f"{Expense.__tablename__}: {await collection.count_documents(query)} document(s) to backfill")
+
+    updated = 0
+    last_id = None
+    while True:
+        # Seek by _id so that a dry run still moves forward
+        batch_query = {**query, "_id": {"$gt": last_id}} if last_id is not None else query
+        docs = await (
+            collection.find(batch_query, {"_id": 1, "title": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+            .to_list(length=batch_size)
+        )
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        operations = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"title_tokens": title_tokens(doc.get("title") or "")}})
+            for doc in docs
+        ]
+        if not dry_run:
+            await collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+        print(f"  {updated} backfilled so far")
+
+    verb = "would backfill" if dry_run else "backfilled"
+    print(f"{Expense.__tablename__}: {verb} {updated}")
+    session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only count what would change")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
@@ -0,0 +1,134 @@
+"""Benchmark /expenses/summary strategies for a user with a heavy month.
+
+Seeds a throwaway database, then compares:
+- legacy:  the former two-trip pipeline ($push every expense, Python loop,
+           full-history lifetime aggregation)
+- facet:   ExpenseRepository.get_monthly_summary (single round trip)
+- rollups: ExpenseService.get_monthly_summary (materialized rollups), with
+           the response cache disabled so every iteration reads the rollups
+
+Usage: python bench_summary.py [--expenses 10000] [--iterations 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import bson
+from pydantic import BaseModel
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.db.indexes import ensure_indexes
+from app.db import session
+from app.models.expense import Expense
+from app.repositories.expense import ExpenseRepository
+from app.repositories.expense_rollup import ExpenseRollupRepository
+from app.repositories.expense_stats import ExpenseStatsRepository
+from app.services.expense import ExpenseService
+
+YEAR, MONTH = 2024, 3
+CATEGORIES = ["Food", "Transport", "Rent", "Fun", "Health", "Shopping", "Bills", "Travel"]
+
+
+async def legacy_summary(repo: ExpenseRepository, user_id: uuid.UUID) -> dict:
+    pipeline = [
+        {"$match": {"user_id": user_id, "date": {"$gte": datetime(YEAR, MONTH, 1), "$lt": datetime(YEAR, MONTH + 1, 1)}}},
+        {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1},
+                    "categories": {"$push": {"category": "$category", "amount": "$amount"}}}},
+    ]
+    summary = (await repo.collection.aggregate(pipeline).to_list(length=1))[0]
+    lifetime = await repo.collection.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "total": {"$sum": "$amount"}}},
+    ]).to_list(length=1)
+    breakdown = {}
+    for entry in summary["categories"]:
+        breakdown[entry["category"]] = breakdown.get(entry["category"], 0) + entry["amount"]
+    return {
+        "total_amount": summary["total"],
+        "lifetime_total": lifetime[0]["total"],
+        "category_breakdown": breakdown,
+        # Size of the documents the server had to build and ship
+        "_bytes": len(bson.encode(summary)) + len(bson.encode(lifetime[0])),
+    }
+
+
+async def seed(db, user_id: uuid.UUID, count: int, history: int) -> None:
+    repo = ExpenseRepository(db)
+    rng = random.Random(42)
+    docs = []
+    for i in range(count + history):
+        in_month = i < count
+        expense = Expense(
+            user_id=user_id,
+            title=f"Expense {i}",
+            amount=Decimal(rng.randint(100, 10000)) / 100,
+            category=rng.choice(CATEGORIES),
+            is_avoidable=rng.random() < 0.3,
+            date=date(YEAR, MONTH, rng.randint(1, 28)) if in_month else date(2020 + rng.randint(0, 3), rng.randint(1, 12), rng.randint(1, 28)),
+        )
+        docs.append(expense.model_dump())
+    for start in range(0, len(docs), 5000):
+        await repo.collection.insert_many(docs[start:start + 5000], ordered=False)
+    await ExpenseRollupRepository(db).rebuild(user_id)
+    await ExpenseStatsRepository(db).rebuild(user_id)
+
+
+async def measure(name: str, fn, iterations: int) -> None:
+    await fn()  # warm up
+    latencies = []
+    tracemalloc.start()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = await fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if isinstance(result, BaseModel):
+        result = result.model_dump()
+    wire = result.get("_bytes") or len(bson.encode(result, codec_options=session.client.codec_options))
+    print(
+        f"{name:<8} median {statistics.median(latencies):8.2f} ms   "
+        f"p95 {sorted(latencies)[int(len(latencies) * 0.95) - 1]:8.2f} ms   "
+        f"client peak {peak / 1024:8.1f} KiB   result ~{wire / 1024:8.1f} KiB"
+    )
+
+
+async def main(expenses: int, history: int, iterations: int) -> None:
+    await session.connect()
+    client = session.client
+    db = client[f"{settings.MONGODB_DB_NAME}_bench"]
+    await client.drop_database(db.name)
+    await ensure_indexes(db)
+    user_id = uuid.uuid4()
+    print(f"Seeding {expenses} expenses in {YEAR}-{MONTH:02d} plus {history} older ones...")
+    await seed(db, user_id, expenses, history)
+
+    repo = ExpenseRepository(db)
+    service = ExpenseService(db)
+    response_cache.enabled = False
+    await measure("legacy", lambda: legacy_summary(repo, user_id), iterations)
+    await measure("facet", lambda: repo.get_monthly_summary(user_id, YEAR, MONTH), iterations)
+    await measure("rollups", lambda: service.get_monthly_summary(user_id, YEAR, MONTH, data_version=0), iterations)
+    await client.drop_database(db.name)
+    session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=10000, help="expenses in the benchmarked month")
+    parser.add_argument("--history", type=int, default=50000, help="expenses in earlier months")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.expenses, args.history, args.iterations))
@@ -0,0 +1,58 @@
+"""Benchmark access-token decoding with and without the verified-token cache.
+
+Simulates a burst of requests from `--clients` clients, each resending its
+own access token, and compares:
+- decode: security.decode_token (HMAC verify and JSON parse every time)
+- cached: security.decode_token_cached (one decode per token, then LRU hits)
+
+Usage: python bench_token_cache.py [--clients 1000] [--requests 200000] [--rps 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.core import security
+from app.core.cache import token_cache
+from app.core.config import settings
+
+
+def run(decode, tokens: list[str]) -> float:
+    start = time.perf_counter()
+    for token in tokens:
+        decode(token, settings.SECRET_KEY)
+    return time.perf_counter() - start
+
+
+def main(clients: int, requests: int, rps: int) -> None:
+    client_tokens = [security.create_access_token(uuid.uuid4()) for _ in range(clients)]
+    stream = random.choices(client_tokens, k=requests)
+
+    token_cache.clear()
+    results = {
+        "decode": run(security.decode_token, stream),
+        "cached": run(security.decode_token_cached, stream),
+    }
+
+    print(f"{requests} requests from {clients} clients")
+    for name, elapsed in results.items():
+        per_request_us = elapsed / requests * 1e6
+        cpu_share = per_request_us * rps / 1e6 * 100
+        print(f"{name:>7}: {per_request_us:7.2f} us/request, {cpu_share:5.1f}% of a core at {rps} rps")
+    saved_us = (results["decode"] - results["cached"]) / requests * 1e6
+    print(f"saved:   {saved_us:7.2f} us/request")
+    print(f"cache:   {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--rps", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.clients, args.requests, args.rps)
@@ -0,0 +1,47 @@
+"""Pick the bcrypt cost (BCRYPT_ROUNDS) for a target hashing latency.
+
+Times one hash per cost factor on this machine, median of a few runs, and
+prints the highest cost that stays within the target. Run it on the
+production hardware; each extra round doubles the time.
+
+Usage: python calibrate_bcrypt.py [--target-ms 250] [--runs 3]
+"""
+import argparse
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+MIN_ROUNDS, MAX_ROUNDS = 10, 16
+
+
+def time_rounds(rounds: int, runs: int) -> float:
+    hasher = bcrypt.using(rounds=rounds)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        hasher.hash("calibration-password")
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(target_ms: float, runs: int) -> None:
+    chosen = None
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        elapsed = time_rounds(rounds, runs)
+        print(f"rounds={rounds}: {elapsed:.1f} ms")
+        if elapsed > target_ms:
+            break
+        chosen = rounds
+    if chosen is None:
+        print(f"Even {MIN_ROUNDS} rounds exceed {target_ms} ms; use BCRYPT_ROUNDS={MIN_ROUNDS}")
+    else:
+        print(f"BCRYPT_ROUNDS={chosen}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    main(args.target_ms, args.runs)
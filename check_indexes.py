@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import os
+import sys
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.db.indexes import ensure_indexes, explain_query_shapes
+from app.db import session
+
+
+async def check_indexes(apply: bool) -> int:
+    db = await session.connect()
+    if apply:
+        await ensure_indexes(db)
+        print("Indexes applied")
+
+    failures = 0
+    for name, collscan in await explain_query_shapes(db):
+        status = "COLLSCAN" if collscan else "ok"
+        print(f"{status:<9} {name}")
+        failures += collscan
+    if failures:
+        print(f"FAILED: {failures} query shape(s) fall back to a collection scan")
+    else:
+        print("All query shapes are index-backed")
+    session.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Explain every repository query shape and fail on COLLSCAN."
+    )
+    parser.add_argument("--apply", action="store_true", help="create indexes before checking")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(check_indexes(args.apply)))
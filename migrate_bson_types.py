@@ -0,0 +1,128 @@
+"""Convert legacy documents to native BSON types.
+
+Documents written before the codec layer store UUIDs as 36-char strings and
+amounts as doubles. This rewrites them as binary UUIDs (subtype 4) and
+Decimal128. Every pass only selects documents that still hold a legacy type,
+so the migration can be interrupted and re-run at any time.
+
+Run it right after deploying the codec layer: until a user's documents are
+converted, queries by binary UUID do not see them.
+
+Usage: python migrate_bson_types.py [--batch-size 1000] [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from decimal import Decimal
+from typing import Any, Type
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import BaseModel
+from pymongo import UpdateOne
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.db import session
+from app.models.category import Category
+from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollup
+from app.models.expense_stats import ExpenseUserStats
+from app.models.pot import Pot
+from app.models.user import User
+
+# model -> (UUID fields, Decimal fields)
+MIGRATIONS: list[tuple[Type[BaseModel], list[str], list[str]]] = [
+    (User, ["id"], []),
+    (Expense, ["id", "user_id"], ["amount"]),
+    (Pot, ["id", "user_id"], ["target_amount", "current_amount"]),
+    (Category, ["id", "user_id"], []),
+    (ExpenseRollup, ["user_id"], ["total", "avoidable_total"]),
+    (ExpenseUserStats, ["user_id"], ["lifetime_total"]),
+]
+
+LEGACY_NUMBER_TYPES = ["double", "int", "long"]
+
+
+def legacy_filter(uuid_fields: list[str], decimal_fields: list[str]) -> dict[str, Any]:
+    return {
+        "$or": [
+            *({field: {"$type": "string"}} for field in uuid_fields),
+            *({field: {"$type": LEGACY_NUMBER_TYPES}} for field in decimal_fields),
+        ]
+    }
+
+
+def converted_fields(
+    doc: dict[str, Any], uuid_fields: list[str], decimal_fields: list[str]
+) -> dict[str, Any]:
+    changes = {}
+    for field in uuid_fields:
+        if isinstance(doc.get(field), str):
+            changes[field] = uuid.UUID(doc[field])
+    for field in decimal_fields:
+        value = doc.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # repr() is the shortest string that round-trips the double
+            changes[field] = Decimal(repr(value))
+    return changes
+
+
+async def migrate_collection(
+    db: AsyncIOMotorDatabase,
+    model: Type[BaseModel],
+    uuid_fields: list[str],
+    decimal_fields: list[str],
+    batch_size: int,
+    dry_run: bool,
+) -> None:
+    collection = db[model.__tablename__]
+    query = legacy_filter(uuid_fields, decimal_fields)
+    print(f"{model.__tablename__}: {await collection.count_documents(query)} document(s) to convert")
+
+    converted = failed = 0
+    last_id = None
+    while True:
+        # Seek by _id so that unconvertible documents are not revisited
+        batch_query = {**query, "_id": {"$gt": last_id}} if last_id is not None else query
+        docs = await collection.find(batch_query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        operations = []
+        for doc in docs:
+            try:
+                changes = converted_fields(doc, uuid_fields, decimal_fields)
+            except ValueError as e:
+                failed += 1
+                print(f"  skipped _id={doc['_id']}: {e}")
+                continue
+            if changes:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        if operations and not dry_run:
+            await collection.bulk_write(operations, ordered=False)
+        converted += len(operations)
+        print(f"  {converted} converted so far")
+
+    verb = "would convert" if dry_run else "converted"
+    print(f"{model.__tablename__}: {verb} {converted}, skipped {failed}")
+
+
+async def main(batch_size: int, dry_run: bool) -> None:
+    db = await session.connect()
+    for model, uuid_fields, decimal_fields in MIGRATIONS:
+        await migrate_collection(db, model, uuid_fields, decimal_fields, batch_size, dry_run)
+    if not dry_run:
+        print("Run `python rebuild_rollups.py` to recompute derived totals exactly.")
+    session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only count what would change")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+
+# Ensure we can import app
+sys.path.append(os.getcwd())
+
+from app.db import session
+from app.repositories.expense_rollup import ExpenseRollupRepository
+from app.repositories.expense_stats import ExpenseStatsRepository
+
+
+async def rebuild_rollups(user_id: uuid.UUID | None):
+    scope = {"user_id": user_id} if user_id else {}
+    label = f"user {user_id}" if user_id else "all users"
+    db = await session.connect()
+
+    rollup_repo = ExpenseRollupRepository(db)
+    await rollup_repo.rebuild(user_id)
+    count = await rollup_repo.collection.count_documents(scope)
+    print(f"Rebuilt expense rollups for {label}: {count} bucket(s)")
+
+    stats_repo = ExpenseStatsRepository(db)
+    await stats_repo.rebuild(user_id)
+    count = await stats_repo.collection.count_documents(scope)
+    print(f"Rebuilt lifetime stats for {label}: {count} user(s)")
+    session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild expense_rollups and expense_user_stats from raw expenses."
+    )
+    parser.add_argument("--user-id", type=uuid.UUID, help="only rebuild this user's documents")
+    args = parser.parse_args()
+    asyncio.run(rebuild_rollups(args.user_id))
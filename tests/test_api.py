@@ -1,6 +1,41 @@
 
+import asyncio
+import json
+import threading
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+
 import pytest
-from httpx import AsyncClient
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+from app.api import deps
+from app.core import cache, security
+from app.core.cache import user_cache
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.core.rate_limit import MemoryRateLimitBackend, Rate, rate_limiter
+from app.db import session
+from app.main import app
+from app.models.expense import Expense
+from app.models.user import User
+from app.repositories.base import BaseRepository
+from app.repositories.expense import ExpenseRepository
+from app.repositories.session import SessionRepository
+from app.repositories.user import UserRepository
+from app.schemas.expense import ExpenseSummary
+from app.services.auth import AuthService
+from app.services.expense import ExpenseService
+
+
+@pytest_asyncio.fixture
+async def api():
+    """A client for endpoints whose database dependencies a test overrides."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides.clear()
 
 @pytest.mark.asyncio
 async def test_register_login(client: AsyncClient):
@@ -57,3 +92,397 @@ async def test_get_summary(client: AsyncClient):
     assert response.status_code == 200
     assert response.json()["success"] is True
     assert "total_amount" in response.json()["data"]
+
+@pytest.mark.asyncio
+async def test_list_expenses_cursor(client: AsyncClient):
+    await client.post("/api/v1/auth/register", json={
+        "email": "cursor@example.com",
+        "full_name": "Cursor User",
+        "password": "Password123!"
+    })
+    await client.post("/api/v1/auth/login", json={
+        "email": "cursor@example.com",
+        "password": "Password123!"
+    })
+    for day in range(1, 6):
+        await client.post("/api/v1/expenses", json={
+            "title": f"Lunch {day}",
+            "amount": 10,
+            "category": "Food",
+            "date": f"2024-03-0{day}"
+        })
+
+    # Walk every page through next_cursor
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = await client.get("/api/v1/expenses", params=params)
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["total_count"] == 5
+        seen.extend(item["id"] for item in data["items"])
+        if not data["next_cursor"]:
+            break
+        params = {"limit": 2, "cursor": data["next_cursor"]}
+    assert len(seen) == len(set(seen)) == 5
+
+    # A cursor is bound to the sort it was issued for
+    first = await client.get("/api/v1/expenses", params={"limit": 2})
+    response = await client.get("/api/v1/expenses", params={
+        "limit": 2, "sort_by": "amount", "cursor": first.json()["data"]["next_cursor"]
+    })
+    assert response.status_code == 422
+
+    # Only indexed, non-nullable fields can be sorted on
+    response = await client.get("/api/v1/expenses", params={"sort_by": "emotion"})
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_import_expenses(client: AsyncClient):
+    await client.post("/api/v1/auth/register", json={
+        "email": "import@example.com",
+        "full_name": "Import User",
+        "password": "Password123!"
+    })
+    await client.post("/api/v1/auth/login", json={
+        "email": "import@example.com",
+        "password": "Password123!"
+    })
+
+    csv_body = (
+        "title,amount,category,date,is_avoidable\n"
+        "Groceries,42.10,Food,2024-03-02,false\n"
+        "Cinema,-5,Fun,2024-03-03,true\n"
+        "Taxi,18,Transport,2024-03-04,\n"
+    )
+    response = await client.post(
+        "/api/v1/expenses/import",
+        files={"file": ("bank.csv", csv_body, "text/csv")},
+    )
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["inserted_count"] == 2
+    assert data["error_count"] == 1
+    assert data["errors"][0]["row"] == 3
+
+    summary = await client.get("/api/v1/expenses/summary", params={"year": 2024, "month": 3})
+    assert summary.json()["data"]["count"] == 2
+
+@pytest.mark.asyncio
+async def test_bulk_expenses(client: AsyncClient):
+    await client.post("/api/v1/auth/register", json={
+        "email": "bulk@example.com",
+        "full_name": "Bulk User",
+        "password": "Password123!"
+    })
+    await client.post("/api/v1/auth/login", json={
+        "email": "bulk@example.com",
+        "password": "Password123!"
+    })
+    ids = []
+    for title in ("Bus", "Train", "Snack"):
+        res = await client.post("/api/v1/expenses", json={
+            "title": title, "amount": 3, "category": "Misc", "date": "2024-05-01"
+        })
+        ids.append(res.json()["data"]["id"])
+
+    response = await client.post("/api/v1/expenses/bulk", json={
+        "action": "update", "ids": ids, "update": {"amount": None}
+    })
+    assert response.status_code == 422
+    response = await client.post("/api/v1/expenses/bulk", json={"action": "delete", "filter": {}})
+    assert response.status_code == 422
+
+    response = await client.post("/api/v1/expenses/bulk", json={
+        "action": "update", "ids": ids[:2], "update": {"category": "Transport"}
+    })
+    assert response.status_code == 200
+    assert response.json()["data"]["affected_count"] == 2
+
+    response = await client.post("/api/v1/expenses/bulk", json={
+        "action": "delete", "filter": {"category": "Misc"}
+    })
+    assert response.json()["data"]["affected_count"] == 1
+
+    summary = await client.get("/api/v1/expenses/summary", params={"year": 2024, "month": 5})
+    assert summary.json()["data"]["category_breakdown"] == {"Transport": "6"}
+
+@pytest.mark.asyncio
+async def test_refresh_rotation_and_logout(client: AsyncClient, monkeypatch):
+    await client.post("/api/v1/auth/register", json={
+        "email": "session@example.com",
+        "full_name": "Session User",
+        "password": "Password123!"
+    })
+    await client.post("/api/v1/auth/login", json={
+        "email": "session@example.com",
+        "password": "Password123!"
+    })
+    first_refresh = client.cookies.get("refresh_token")
+
+    response = await client.post("/api/v1/auth/refresh")
+    assert response.status_code == 200
+    assert client.cookies.get("refresh_token") != first_refresh
+
+    # A concurrent refresh with the token just rotated away (another tab) is accepted
+    response = await client.post("/api/v1/auth/refresh", cookies={"refresh_token": first_refresh})
+    assert response.status_code == 200
+
+    # Past the grace window, replaying it revokes the session
+    monkeypatch.setattr(settings, "SESSION_REFRESH_GRACE_SECONDS", 0)
+    response = await client.post("/api/v1/auth/refresh", cookies={"refresh_token": first_refresh})
+    assert response.status_code == 401
+    response = await client.get("/api/v1/auth/me")
+    assert response.status_code == 401
+
+    await client.post("/api/v1/auth/login", json={
+        "email": "session@example.com",
+        "password": "Password123!"
+    })
+    access_token = client.cookies.get("access_token")
+    await client.post("/api/v1/auth/logout")
+    response = await client.get("/api/v1/auth/me", cookies={"access_token": access_token})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_login_is_rate_limited_per_ip_even_with_a_cookie(api: AsyncClient, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "backend", MemoryRateLimitBackend(maxsize=100))
+    rate = Rate.parse(settings.RATE_LIMIT_LOGIN)
+    for _ in range(rate.capacity):
+        await rate_limiter.hit("auth.login:ip:127.0.0.1", rate)
+
+    access_token = security.create_access_token(uuid.uuid4(), session_id=str(uuid.uuid4()))
+    response = await api.post(
+        "/api/v1/auth/login",
+        json={"email": "limited@example.com", "password": "Password123!"},
+        cookies={"access_token": access_token},
+    )
+
+    assert response.status_code == 429
+    assert response.json()["error"]["code"] == "RATE_LIMITED"
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_summary_etag_not_modified(api: AsyncClient, monkeypatch):
+    user = User(email="etag@example.com", hashed_password="x")
+    version = {"value": 1}
+    calls = []
+
+    async def get_monthly_summary(self, user_id, year, month, data_version=None):
+        calls.append(data_version)
+        return ExpenseSummary(total_amount=10, count=1, category_breakdown={"Food": 10})
+
+    monkeypatch.setattr(ExpenseService, "get_monthly_summary", get_monthly_summary)
+    app.dependency_overrides[deps.get_current_user] = lambda: user
+    app.dependency_overrides[deps.data_version] = lambda: version["value"]
+    params = {"year": 2024, "month": 3}
+
+    response = await api.get("/api/v1/expenses/summary", params=params)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    # The client's copy is current: no body, and the endpoint never runs
+    response = await api.get(
+        "/api/v1/expenses/summary", params=params, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    assert calls == [1]
+
+    # Other months are tagged separately
+    response = await api.get(
+        "/api/v1/expenses/summary", params={"year": 2024, "month": 4},
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+
+    # A write bumps the version, which retires the old tag
+    version["value"] = 2
+    response = await api.get(
+        "/api/v1/expenses/summary", params=params, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert calls == [1, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_current_user_cache_dropped_on_profile_and_password_change(api: AsyncClient, monkeypatch):
+    user = User(email="cached@example.com", hashed_password="x", full_name="Before")
+    users = {user.id: user}
+    lookups = []
+
+    async def get(self, id, fields=None):
+        lookups.append(id)
+        return users.get(id)
+
+    async def update(self, *, db_obj, obj_in):
+        users[db_obj.id] = db_obj.model_copy(update=obj_in)
+        return users[db_obj.id]
+
+    async def revoke_user(self, user_id):
+        pass
+
+    async def create_tokens(self, user_id):
+        return {"access_token": access_token, "refresh_token": "refresh"}
+
+    monkeypatch.setattr(UserRepository, "get", get)
+    monkeypatch.setattr(BaseRepository, "update", update)
+    monkeypatch.setattr(SessionRepository, "revoke_user", revoke_user)
+    monkeypatch.setattr(AuthService, "create_tokens", create_tokens)
+    access_token = security.create_access_token(user.id, session_id=str(uuid.uuid4()))
+    api.cookies.set("access_token", access_token)
+
+    # Repeat requests are served from the cache
+    for _ in range(2):
+        response = await api.get("/api/v1/auth/me")
+        assert response.status_code == 200
+        assert response.json()["data"]["full_name"] == "Before"
+    assert lookups == [user.id]
+
+    # A profile edit is visible on the very next request
+    response = await api.patch("/api/v1/auth/me", json={"full_name": "After"})
+    assert response.status_code == 200
+    response = await api.get("/api/v1/auth/me")
+    assert response.json()["data"]["full_name"] == "After"
+    assert lookups == [user.id, user.id]
+
+    # So is a password change, which must not leave the old hash cached
+    response = await api.patch("/api/v1/auth/me", json={"password": "NewPassword123!"})
+    assert response.status_code == 200
+    await api.get("/api/v1/auth/me")
+    assert lookups == [user.id, user.id, user.id]
+    assert user_cache.get(user.id, "user").hashed_password == users[user.id].hashed_password != "x"
+
+
+@pytest.mark.asyncio
+async def test_verified_token_claims_cached_until_exp(api: AsyncClient, monkeypatch):
+    user = User(email="claims@example.com", hashed_password="x")
+    user_cache.set(user.id, "user", user)
+    access_token = security.create_access_token(
+        user.id, expires_delta=timedelta(minutes=5), session_id=str(uuid.uuid4())
+    )
+    exp = security.decode_token(access_token, settings.SECRET_KEY)["exp"]
+    decode_token = security.decode_token
+    verified = []
+
+    def counting_decode_token(token, secret):
+        verified.append(token)
+        return decode_token(token, secret)
+
+    monkeypatch.setattr(security, "decode_token", counting_decode_token)
+    api.cookies.set("access_token", access_token)
+
+    for _ in range(3):
+        assert (await api.get("/api/v1/auth/me")).status_code == 200
+    assert len(verified) == 1
+
+    # Past the token's exp the cached claims are gone and the signature and
+    # expiry are checked again
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: exp + 1, monotonic=time.monotonic))
+    assert (await api.get("/api/v1/auth/me")).status_code == 200
+    assert len(verified) == 2
+
+
+@pytest.mark.asyncio
+async def test_list_expenses_sparse_fields(api: AsyncClient, monkeypatch):
+    user = User(email="sparse@example.com", hashed_password="x")
+    requested = []
+
+    async def get_multi_by_user(self, *, fields, **kwargs):
+        requested.append(fields)
+        # The repository also fetches the sort key and id for the cursor
+        doc = {"id": uuid.uuid4(), "date": "2024-03-01", "title": "Coffee", "amount": "3.50"}
+        return [Expense.model_construct(**{k: v for k, v in doc.items() if k in {*fields, "id", "date"}})], None
+
+    async def get_totals(self, **kwargs):
+        return {"total_count": 1, "total_amount": 3.5, "total_avoidable_amount": 0}
+
+    monkeypatch.setattr(rate_limiter, "backend", MemoryRateLimitBackend(maxsize=100))
+    monkeypatch.setattr(ExpenseRepository, "get_multi_by_user", get_multi_by_user)
+    monkeypatch.setattr(ExpenseRepository, "get_totals", get_totals)
+    app.dependency_overrides[deps.get_current_user] = lambda: user
+    app.dependency_overrides[deps.data_version] = lambda: 1
+
+    response = await api.get("/api/v1/expenses", params={"fields": "title, amount"})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["items"] == [{"title": "Coffee", "amount": "3.50"}]
+    assert data["total_count"] == 1
+    assert requested == [{"title", "amount"}]
+    assert "ETag" in response.headers
+
+    response = await api.get("/api/v1/expenses", params={"fields": "title,hashed_password"})
+    assert response.status_code == 422
+    assert response.json()["error"]["data"]["unknown"] == ["hashed_password"]
+
+
+@pytest.mark.asyncio
+async def test_export_expenses_streams_attachment(api: AsyncClient, monkeypatch):
+    user = User(email="export@example.com", hashed_password="x")
+    filters = []
+
+    async def iter_by_user(self, *, user_id, fields, batch_size, **kwargs):
+        filters.append(kwargs)
+        yield {"id": uuid.uuid4(), "title": "Taxi", "amount": 18, "category": "Transport"}
+
+    monkeypatch.setattr(rate_limiter, "backend", MemoryRateLimitBackend(maxsize=100))
+    monkeypatch.setattr(ExpenseRepository, "iter_by_user", iter_by_user)
+    app.dependency_overrides[deps.get_current_user] = lambda: user
+
+    response = await api.get("/api/v1/expenses/export", params={"format": "ndjson", "category": "Transport"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="expenses.ndjson"'
+    assert [line["title"] for line in map(json.loads, response.text.splitlines())] == ["Taxi"]
+    assert filters[0]["category"] == "Transport"
+
+
+@pytest.mark.asyncio
+async def test_db_client_created_on_first_use_with_pool_settings(api: AsyncClient, monkeypatch):
+    monkeypatch.setattr(session, "client", None)
+    monkeypatch.setattr(session, "db", None)
+    monkeypatch.setattr(settings, "MONGODB_URL", "mongodb://127.0.0.1:1")
+    monkeypatch.setattr(settings, "MONGODB_SERVER_SELECTION_TIMEOUT_MS", 100)
+    opened = session.pool_stats.open
+
+    db = await session.get_db()
+    try:
+        assert db is session.db and db.name == settings.MONGODB_DB_NAME
+        assert await session.get_db() is db
+        assert session.client.options.pool_options.max_pool_size == settings.MONGODB_MAX_POOL_SIZE
+        assert session.pool_stats.open == opened
+
+        # Nothing listens there, so readiness fails but still reports the pool
+        response = await api.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "unavailable"
+        assert response.json()["pool"]["max_size"] == settings.MONGODB_MAX_POOL_SIZE
+    finally:
+        session.close()
+    assert session.client is None and session.db is None
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_runs_in_bounded_pool(monkeypatch):
+    assert (await security._run_password_task(lambda: threading.current_thread().name)).startswith("password-hash")
+
+    # Hashes below the configured cost verify and come back upgraded
+    weak = security.pwd_context.handler("bcrypt").using(rounds=4).hash("Password123!")
+    verified, new_hash = await security.verify_and_update_password("Password123!", weak)
+    assert verified and security.pwd_context.identify(new_hash) == "bcrypt"
+    assert f"${settings.BCRYPT_ROUNDS:02d}$" in new_hash
+    assert await security.verify_password("Password123!", new_hash)
+    assert not await security.verify_password("wrong", new_hash)
+
+    # With every worker busy, callers give up after the queue timeout
+    monkeypatch.setattr(security, "_password_slots", asyncio.Semaphore(0))
+    monkeypatch.setattr(settings, "PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", 0.01)
+    with pytest.raises(ServiceUnavailableError):
+        await security.get_password_hash("Password123!")
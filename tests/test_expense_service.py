@@ -0,0 +1,738 @@
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import bson
+import pytest
+from pydantic import ValidationError as PydanticValidationError
+from pymongo import ReadPreference
+from pymongo.errors import OperationFailure
+
+from app.core.cache import response_cache
+from app.core.config import Settings, settings
+from app.core.exceptions import NotFoundError, ValidationError
+from app.db.codecs import codec_options
+from app.db.indexes import INDEXED_MODELS, QUERY_SHAPES, ensure_indexes, explain_query_shapes
+from app.db.read_preference import read_preference_for
+from app.models.category import Category
+from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollup
+from app.models.expense_stats import ExpenseUserStats
+from app.models.pot import Pot
+from app.repositories.expense import ExpenseRepository
+from app.repositories.expense_rollup import ExpenseRollupRepository
+from app.repositories.expense_stats import ExpenseStatsRepository
+from app.schemas.category import CategoryUpdate
+from app.schemas.expense import ExpenseUpdate
+from app.services.ai import AIService
+from app.services.category import CategoryService
+from app.services.expense import ExpenseService
+from app.services.pot import PotService
+
+
+class StubExpenseRepository:
+    def __init__(self, rows=(), expenses=()):
+        self.rows = list(rows)
+        self.expenses = {expense.id: expense for expense in expenses}
+        self.calls = 0
+
+    async def get_timeseries(self, user_id, start_date, end_date, bucket, group_by):
+        self.calls += 1
+        return self.rows
+
+    async def get_lifetime_total(self, user_id):
+        return sum((e.amount for e in self.expenses.values() if e.user_id == user_id), Decimal("0"))
+
+    async def update_owned(self, *, id, user_id, obj_in, return_document):
+        expense = self.expenses.get(id)
+        if expense is None or expense.user_id != user_id:
+            return None
+        self.expenses[id] = expense.model_copy(update=obj_in)
+        return expense
+
+    async def get_multi_by_user(self, *, user_id, skip, limit, cursor, **kwargs):
+        # Cursors are the index of the next expense
+        owned = [e for e in self.expenses.values() if e.user_id == user_id]
+        start = int(cursor) if cursor else skip
+        end = start + limit
+        return owned[start:end], str(end) if end < len(owned) else None
+
+    async def get_totals(self, *, user_id, **filters):
+        self.calls += 1
+        owned = [e for e in self.expenses.values() if e.user_id == user_id]
+        return {
+            "total_count": len(owned),
+            "total_amount": sum((e.amount for e in owned), Decimal("0")),
+            "total_avoidable_amount": Decimal("0"),
+        }
+
+
+class StubUserRepository:
+    def __init__(self, data_version=0):
+        self.data_version = data_version
+
+    async def get_data_version(self, user_id):
+        return self.data_version
+
+    async def bump_data_version(self, user_id):
+        self.data_version += 1
+
+
+class StubRollupRepository:
+    def __init__(self, rollups=()):
+        self.rollups = list(rollups)
+        self.deltas = []
+
+    async def get_month(self, user_id, year, month):
+        return [r for r in self.rollups if (r.user_id, r.year, r.month) == (user_id, year, month)]
+
+    async def apply_deltas(self, user_id, deltas):
+        self.deltas.append(deltas)
+
+
+class StubStatsRepository:
+    def __init__(self, stats=None):
+        self.stats = stats
+        self.applied = []
+
+    async def get_by_user(self, user_id):
+        return self.stats
+
+    async def apply_expenses(self, user_id, added=(), removed=()):
+        self.applied.append((list(added), list(removed)))
+
+
+def make_service(expense_repo, user_repo=None) -> ExpenseService:
+    service = ExpenseService.__new__(ExpenseService)
+    service.expense_repo = expense_repo
+    service.user_repo = user_repo or StubUserRepository()
+    service.rollup_repo = StubRollupRepository()
+    service.stats_repo = StubStatsRepository()
+    return service
+
+
+def make_expense(user_id, **fields) -> Expense:
+    return Expense(**{
+        "user_id": user_id,
+        "title": "Coffee",
+        "amount": Decimal("3.50"),
+        "category": "Food",
+        "emotion": "Happy",
+        "date": date(2024, 1, 15),
+        **fields,
+    })
+
+
+class IndexDatabase:
+    codec_options = codec_options
+
+    def __init__(self, failing=(), collscans=()):
+        self.failing = set(failing)
+        self.collscans = set(collscans)
+        self.created = {}
+        self.explained = []
+
+    def __getitem__(self, name):
+        db = self
+
+        class Collection:
+            async def create_indexes(self, indexes):
+                if name in db.failing:
+                    raise OperationFailure("E11000 duplicate key")
+                db.created[name] = [index.document["name"] for index in indexes]
+
+        return Collection()
+
+    async def command(self, name, command, verbosity=None, codec_options=None):
+        self.explained.append(command)
+        collection = command.get("find") or command.get("aggregate")
+        stage = "COLLSCAN" if collection in self.collscans else "IXSCAN"
+        return {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": stage}}}}
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_keeps_going_past_a_failing_collection():
+    db = IndexDatabase(failing={"users"})
+
+    await ensure_indexes(db)
+
+    assert "users" not in db.created
+    assert len(db.created) == len(INDEXED_MODELS) - 1
+    assert db.created["expenses"][:2] == ["id_unique", "user_date_id"]
+
+
+@pytest.mark.asyncio
+async def test_explain_flags_query_shapes_that_scan_the_collection():
+    db = IndexDatabase(collscans={"pots"})
+
+    results = await explain_query_shapes(db)
+
+    assert [name for name, _ in results] == [shape.name for shape in QUERY_SHAPES]
+    assert [name for name, collscan in results if collscan] == ["PotRepository.get_multi_by_user"]
+    assert {"find", "filter", "sort"} <= db.explained[2].keys()
+    assert "pipeline" in next(c for c in db.explained if "aggregate" in c)
+
+
+@pytest.mark.asyncio
+async def test_timeseries_second_call_served_from_cache():
+    user_id = uuid.uuid4()
+    repo = StubExpenseRepository(rows=[
+        {"key": "Food", "period": date(2024, 1, 1), "total": Decimal("12.50"), "count": 2},
+        {"key": "Rent", "period": date(2024, 2, 1), "total": Decimal("900"), "count": 1},
+    ])
+    service = make_service(repo)
+
+    first = await service.get_timeseries(
+        user_id, date(2024, 1, 1), date(2024, 2, 29), "month", "category"
+    )
+    second = await service.get_timeseries(
+        user_id, date(2024, 1, 1), date(2024, 2, 29), "month", "category"
+    )
+
+    assert repo.calls == 1
+    assert second == first
+    assert [s.key for s in second.series] == ["Food", "Rent"]
+    await response_cache.invalidate_user(user_id)
+
+
+@pytest.mark.asyncio
+async def test_timeseries_cache_misses_after_data_version_changes():
+    user_id = uuid.uuid4()
+    repo = StubExpenseRepository()
+    users = StubUserRepository(data_version=3)
+    service = make_service(repo, users)
+
+    await service.get_timeseries(user_id, date(2024, 1, 1), date(2024, 1, 31))
+    # A write elsewhere bumped the version but its invalidation has not landed
+    users.data_version = 4
+    await service.get_timeseries(user_id, date(2024, 1, 1), date(2024, 1, 31))
+
+    assert repo.calls == 2
+    await response_cache.invalidate_user(user_id)
+
+
+@pytest.mark.asyncio
+async def test_list_totals_computed_once_across_pages():
+    user_id = uuid.uuid4()
+    repo = StubExpenseRepository(expenses=[make_expense(user_id) for _ in range(5)])
+    service = make_service(repo)
+
+    first = await service.get_expenses(user_id, limit=2)
+    second = await service.get_expenses(user_id, limit=2, cursor=first.next_cursor)
+    third = await service.get_expenses(user_id, limit=2, cursor=second.next_cursor)
+
+    assert [len(page.items) for page in (first, second, third)] == [2, 2, 1]
+    assert {page.total_count for page in (first, second, third)} == {5}
+    assert third.next_cursor is None
+    assert repo.calls == 1
+
+    # The first page always recounts, and a write moves every key
+    await service.get_expenses(user_id, limit=3)
+    assert repo.calls == 2
+    await service.get_expenses(user_id, limit=2, cursor=first.next_cursor, data_version=1)
+    assert repo.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_timeseries_rejects_too_many_buckets_before_querying():
+    repo = StubExpenseRepository()
+    service = make_service(repo)
+
+    with pytest.raises(ValidationError):
+        await service.get_timeseries(uuid.uuid4(), date.min, date(9999, 12, 30), "day")
+
+    assert repo.calls == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("bucket, points", [("day", 31), ("week", 5), ("month", 1)])
+async def test_timeseries_range_ending_at_date_max(bucket, points):
+    user_id = uuid.uuid4()
+    service = make_service(StubExpenseRepository())
+
+    result = await service.get_timeseries(user_id, date(9999, 12, 1), date.max, bucket)
+
+    assert len(result.series[0].points) == points
+    await response_cache.invalidate_user(user_id)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+async def test_export_streams_one_chunk_per_batch(format, monkeypatch):
+    user_id = uuid.uuid4()
+    # As read back from Mongo, where dates are midnight datetimes
+    docs = [
+        {**make_expense(user_id, title=f"Item {n}").model_dump(), "date": datetime(2024, 1, n)}
+        for n in (1, 2, 3)
+    ]
+    batch_sizes = []
+
+    class Repository:
+        async def iter_by_user(self, *, user_id, fields, batch_size, **filters):
+            batch_sizes.append(batch_size)
+            for doc in docs:
+                yield {field: doc[field] for field in fields}
+
+    monkeypatch.setattr(settings, "EXPENSE_EXPORT_BATCH_SIZE", 2)
+    service = make_service(Repository())
+
+    chunks = [chunk async for chunk in service.export_expenses(user_id, format)]
+
+    assert batch_sizes == [2]
+    assert len(chunks) == 2
+    lines = "".join(chunks).splitlines()
+    if format == "csv":
+        assert lines[0] == "id,title,amount,category,emotion,is_avoidable,date,created_at"
+        assert lines[1].split(",")[1:7] == ["Item 1", "3.50", "Food", "Happy", "False", "2024-01-01"]
+        assert len(lines) == 4
+    else:
+        rows = [json.loads(line) for line in lines]
+        assert [row["title"] for row in rows] == ["Item 1", "Item 2", "Item 3"]
+        assert rows[0]["amount"] == "3.50" and rows[0]["date"] == "2024-01-01"
+
+
+@pytest.mark.asyncio
+async def test_update_clears_emotion_with_null():
+    user_id = uuid.uuid4()
+    expense = make_expense(user_id)
+    service = make_service(StubExpenseRepository(expenses=[expense]))
+
+    updated = await service.update_expense(
+        expense.id, user_id, ExpenseUpdate.model_validate({"emotion": None})
+    )
+
+    assert updated.emotion is None
+    assert updated.amount == expense.amount
+
+
+@pytest.mark.parametrize("field", ["title", "amount", "category", "is_avoidable", "date"])
+def test_update_rejects_null_required_field(field):
+    with pytest.raises(PydanticValidationError):
+        ExpenseUpdate.model_validate({field: None})
+
+
+def test_codec_rounds_amounts_to_decimal128_precision():
+    expense = make_expense(uuid.uuid4(), amount=Decimal("1." + "3" * 40))
+
+    doc = bson.decode(bson.encode(expense.model_dump(), codec_options=codec_options), codec_options=codec_options)
+
+    assert doc["amount"] == Decimal("1." + "3" * 33)
+
+
+@pytest.mark.parametrize("amount", ["1e7000", "1e-7000"])
+def test_amount_outside_decimal128_range_is_rejected(amount):
+    with pytest.raises(PydanticValidationError):
+        ExpenseUpdate.model_validate({"amount": amount})
+
+
+@pytest.mark.asyncio
+async def test_update_moves_rollup_contribution_to_new_bucket():
+    user_id = uuid.uuid4()
+    expense = make_expense(user_id, amount=Decimal("3.50"), date=date(2024, 1, 15))
+    service = make_service(StubExpenseRepository(expenses=[expense]))
+
+    await service.update_expense(expense.id, user_id, ExpenseUpdate(
+        category="Travel", amount=Decimal("10"), date=date(2024, 2, 1), is_avoidable=True
+    ))
+    await service.update_expense(expense.id, user_id, ExpenseUpdate(amount=Decimal("12")))
+
+    assert service.rollup_repo.deltas == [
+        {
+            (2024, 1, "Food"): [-1, Decimal("-3.50"), Decimal("0")],
+            (2024, 2, "Travel"): [1, Decimal("10"), Decimal("10")],
+        },
+        {(2024, 2, "Travel"): [0, Decimal("2"), Decimal("2")]},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_summary_sums_lifetime_from_expenses_without_stats():
+    user_id = uuid.uuid4()
+    expenses = [
+        make_expense(user_id, amount=Decimal("3.50"), date=date(2024, 1, 15)),
+        make_expense(user_id, amount=Decimal("10"), date=date(2023, 6, 1)),
+    ]
+    service = make_service(StubExpenseRepository(expenses=expenses))
+    service.rollup_repo.rollups = [
+        ExpenseRollup(user_id=user_id, year=2024, month=1, category="Food", count=1, total=Decimal("3.50"))
+    ]
+
+    summary = await service.get_monthly_summary(user_id, 2024, 1, data_version=0)
+
+    assert summary.total_amount == Decimal("3.50")
+    assert summary.lifetime_total == Decimal("13.50")
+    await response_cache.invalidate_user(user_id)
+
+
+class StubCollection:
+    def __init__(self, doc=None):
+        self.doc = doc
+        self.updates = []
+
+    async def find_one_and_update(self, filter, update, upsert=False, return_document=None):
+        self.updates.append((filter, update, upsert))
+        return self.doc
+
+    async def bulk_write(self, operations, ordered=True):
+        self.updates.extend(operations)
+
+
+@pytest.mark.asyncio
+async def test_stats_delta_without_document_rebuilds_instead_of_upserting():
+    user_id = uuid.uuid4()
+    repo = ExpenseStatsRepository.__new__(ExpenseStatsRepository)
+    repo.collection = StubCollection(doc=None)
+    rebuilt = []
+
+    async def rebuild(user_id=None):
+        rebuilt.append(user_id)
+
+    repo.rebuild = rebuild
+
+    await repo.apply_delta(user_id, count=-1, total=Decimal("-3.50"))
+
+    assert [upsert for _, _, upsert in repo.collection.updates] == [False]
+    assert rebuilt == [user_id]
+
+
+@pytest.mark.asyncio
+async def test_stats_fold_writes_into_one_delta():
+    user_id = uuid.uuid4()
+    first = make_expense(user_id, amount=Decimal("3.50"), date=date(2024, 1, 15))
+    stats_doc = {"user_id": user_id, "lifetime_total": Decimal("3.50"), "lifetime_count": 1,
+                 "first_expense_date": date(2024, 1, 15), "last_expense_date": date(2024, 1, 15)}
+    repo = ExpenseStatsRepository.__new__(ExpenseStatsRepository)
+    repo.collection = StubCollection(doc=stats_doc)
+    refreshed = []
+
+    async def refresh_date_bounds(user_id):
+        refreshed.append(user_id)
+
+    repo._refresh_date_bounds = refresh_date_bounds
+
+    # A category change leaves every stat as it was
+    await repo.apply_expenses(user_id, added=[first.model_copy(update={"category": "Fun"})], removed=[first])
+    assert repo.collection.updates == []
+
+    await repo.apply_expenses(user_id, added=[first.model_copy(update={"amount": Decimal("5")})], removed=[first])
+    assert repo.collection.updates[-1][1]["$inc"] == {"lifetime_count": 0, "lifetime_total": Decimal("1.50")}
+    assert refreshed == []
+
+    # Removing the expense on a boundary date re-seeks the bounds
+    await repo.apply_expenses(user_id, removed=[first])
+    assert repo.collection.updates[-1][1] == {"$inc": {"lifetime_count": -1, "lifetime_total": Decimal("-3.50")}}
+    assert refreshed == [user_id]
+
+
+@pytest.mark.asyncio
+async def test_summary_reads_lifetime_total_from_stats():
+    user_id = uuid.uuid4()
+    repo = StubExpenseRepository()
+    service = make_service(repo)
+    service.stats_repo.stats = ExpenseUserStats(user_id=user_id, lifetime_total=Decimal("42"))
+
+    async def get_lifetime_total(user_id):
+        raise AssertionError("summed every expense despite a stats document")
+
+    repo.get_lifetime_total = get_lifetime_total
+
+    summary = await service.get_monthly_summary(user_id, 2024, 1, data_version=0)
+
+    assert summary.lifetime_total == Decimal("42")
+    await response_cache.invalidate_user(user_id)
+
+
+@pytest.mark.asyncio
+async def test_rollup_deltas_only_create_buckets_that_gain_expenses():
+    repo = ExpenseRollupRepository.__new__(ExpenseRollupRepository)
+    repo.collection = StubCollection()
+    deltas = {
+        (2024, 1, "Food"): [-1, Decimal("-3.50"), Decimal("0")],
+        (2024, 2, "Food"): [1, Decimal("3.50"), Decimal("0")],
+        (2024, 3, "Food"): [0, Decimal("1.25"), Decimal("0")],
+    }
+
+    await repo.apply_deltas(uuid.uuid4(), deltas)
+
+    assert [(op._filter["month"], op._upsert) for op in repo.collection.updates] == [
+        (1, False), (2, True), (3, False)
+    ]
+
+
+@pytest.mark.parametrize("query, prefix, expected", [
+    ("Coffee beans", False, {"$text": {"$search": '"coffee" "beans"'}}),
+    ("Coffee be", True, {"$text": {"$search": '"coffee"'}, "title_tokens": {"$regex": "^be"}}),
+    ("coffee", True, {"title_tokens": {"$regex": "^coffee"}}),
+    ("Co", False, {"title_tokens": {"$regex": "^co"}}),
+    ("c.*", False, {"title_tokens": {"$regex": "^c"}}),
+    ("?!", False, {}),
+])
+def test_title_search_uses_indexed_filters(query, prefix, expected):
+    assert ExpenseRepository._build_search_filter(query, prefix) == expected
+
+
+def test_title_tokens_stored_on_title_writes():
+    assert make_expense(uuid.uuid4(), title="Coffee & coffee beans").title_tokens == ["coffee", "beans"]
+    assert ExpenseRepository._with_title_tokens({"title": "Taxi home"})["title_tokens"] == ["taxi", "home"]
+    assert ExpenseRepository._with_title_tokens({"amount": 5}) == {"amount": 5}
+
+
+class StubCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+
+@pytest.mark.asyncio
+async def test_get_many_keeps_id_order_and_skips_missing_ids():
+    user_id = uuid.uuid4()
+    first, second = make_expense(user_id, title="First"), make_expense(user_id, title="Second")
+    queries = []
+
+    class Collection:
+        def find(self, filter, projection=None):
+            queries.append(filter)
+            found = [e.model_dump() for e in (first, second) if e.id in filter["id"]["$in"]]
+            return StubCursor(found)
+
+    repo = ExpenseRepository.__new__(ExpenseRepository)
+    repo.model = Expense
+    repo.collection = Collection()
+
+    result = await repo.get_many([second.id, uuid.uuid4(), first.id, second.id])
+
+    assert [e.title for e in result] == ["Second", "First"]
+    assert len(queries) == 1
+    assert await repo.get_many([]) == []
+    assert len(queries) == 1
+
+
+class AggregateCollection:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.pipelines = []
+
+    def with_options(self, **kwargs):
+        return self
+
+    def aggregate(self, pipeline, session=None):
+        self.pipelines.append(pipeline)
+        return StubCursor(self.results.pop(0))
+
+
+@pytest.mark.asyncio
+async def test_monthly_summary_is_one_aggregation():
+    user_id = uuid.uuid4()
+    repo = ExpenseRepository.__new__(ExpenseRepository)
+    repo.collection = AggregateCollection([{
+        "categories": [{"_id": "Rent", "total": Decimal("900"), "count": 1},
+                       {"_id": "Food", "total": Decimal("45.50"), "count": 3}],
+        "month": [{"_id": None, "total": Decimal("945.50"), "count": 4}],
+        "lifetime": [{"lifetime_total": Decimal("5000")}],
+    }])
+
+    summary = await repo.get_monthly_summary(user_id, 2024, 12)
+
+    assert summary == {
+        "total_amount": Decimal("945.50"),
+        "count": 4,
+        "lifetime_total": Decimal("5000"),
+        "category_breakdown": {"Rent": Decimal("900"), "Food": Decimal("45.50")},
+    }
+    (pipeline,) = repo.collection.pipelines
+    assert pipeline[0]["$match"]["date"] == {"$gte": datetime(2024, 12, 1), "$lt": datetime(2025, 1, 1)}
+
+
+@pytest.mark.asyncio
+async def test_monthly_summary_without_expenses_or_stats():
+    repo = ExpenseRepository.__new__(ExpenseRepository)
+    repo.collection = AggregateCollection(
+        [{"categories": [], "month": [], "lifetime": []}],
+        [{"_id": None, "total": Decimal("12")}],
+    )
+
+    summary = await repo.get_monthly_summary(uuid.uuid4(), 2024, 3)
+
+    assert summary == {
+        "total_amount": 0, "count": 0, "lifetime_total": Decimal("12"), "category_breakdown": {}
+    }
+    assert len(repo.collection.pipelines) == 2
+
+
+@pytest.mark.asyncio
+async def test_sparse_page_projects_requested_fields_and_cursor_keys():
+    user_id = uuid.uuid4()
+    expenses = [make_expense(user_id, amount=Decimal(n)) for n in (3, 2, 1)]
+    finds = []
+
+    class Collection:
+        def find(self, filter, projection=None):
+            finds.append(projection)
+            docs = [{k: v for k, v in e.model_dump().items() if k in projection} for e in expenses]
+            return FindCursor(docs)
+
+    class FindCursor(StubCursor):
+        def sort(self, sort):
+            return self
+
+        def skip(self, skip):
+            return self
+
+        def limit(self, limit):
+            return self
+
+    repo = ExpenseRepository.__new__(ExpenseRepository)
+    repo.model = Expense
+    repo.collection = Collection()
+
+    page, next_cursor = await repo.get_multi_by_user(
+        user_id=user_id, limit=2, sort_by="amount", fields={"title"}
+    )
+
+    assert finds == [{"_id": 0, "title": 1, "amount": 1, "id": 1}]
+    assert [e.title for e in page] == ["Coffee", "Coffee"]
+    assert next_cursor is not None
+
+
+@pytest.fixture
+def read_preferences(monkeypatch):
+    monkeypatch.setattr(settings, "MONGODB_READ_PREFERENCES", {
+        "ExpenseRepository.get_timeseries": "secondaryPreferred",
+        "ExpenseStatsRepository.get_by_user": "primary",
+    })
+    monkeypatch.setattr(settings, "MONGODB_MAX_STALENESS_SECONDS", 120)
+    read_preference_for.cache_clear()
+    yield
+    read_preference_for.cache_clear()
+
+
+def test_configured_reads_go_to_secondaries(read_preferences):
+    class Collection:
+        def with_options(self, read_preference):
+            return read_preference
+
+    repo = ExpenseRepository.__new__(ExpenseRepository)
+    repo.collection = Collection()
+
+    routed = repo._reader("get_timeseries")
+    assert routed.mode == ReadPreference.SECONDARY_PREFERRED.mode
+    assert routed.max_staleness == 120
+    # Unlisted and primary methods keep the pinned primary collection
+    assert repo._reader("get_recent") is repo.collection
+    assert read_preference_for("ExpenseStatsRepository.get_by_user") == ReadPreference.PRIMARY
+
+
+def test_unknown_read_preference_mode_is_rejected():
+    with pytest.raises(PydanticValidationError, match="Unknown read preference modes"):
+        Settings(MONGODB_READ_PREFERENCES={"ExpenseRepository.get_timeseries": "secondarish"})
+
+
+class LostRaceRepository:
+    """Owns the document, but every owner-scoped write matches nothing."""
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    async def get(self, id):
+        return self.doc
+
+    async def update_owned(self, **kwargs):
+        return None
+
+    async def remove_owned(self, **kwargs):
+        return None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("action", ["update", "delete"])
+async def test_category_write_that_matches_nothing_is_not_found(action):
+    user_id = uuid.uuid4()
+    category = Category(user_id=user_id, name="Food")
+    service = CategoryService.__new__(CategoryService)
+    service.category_repo = LostRaceRepository(category)
+    service.user_repo = StubUserRepository()
+
+    with pytest.raises(NotFoundError):
+        if action == "update":
+            await service.update_category(category.id, user_id, CategoryUpdate(name="Groceries"))
+        else:
+            await service.delete_category(category.id, user_id)
+
+    assert service.user_repo.data_version == 0
+
+
+@pytest.mark.asyncio
+async def test_pot_delete_that_matches_nothing_is_not_found():
+    user_id = uuid.uuid4()
+    pot = Pot(user_id=user_id, title="Trip", target_amount=Decimal("500"), target_date=date(2030, 1, 1))
+    service = PotService.__new__(PotService)
+    service.pot_repo = LostRaceRepository(pot)
+    service.user_repo = StubUserRepository()
+
+    with pytest.raises(NotFoundError):
+        await service.delete_pot(pot.id, user_id)
+
+    assert service.user_repo.data_version == 0
+
+
+class StubAnalysisRepository:
+    def __init__(self):
+        self.entries = {}
+
+    async def get_cached(self, user_id, key):
+        return self.entries.get((user_id, key))
+
+    async def store(self, user_id, key, analysis, ttl):
+        self.entries[(user_id, key)] = analysis
+
+
+def make_ai_service(replies) -> AIService:
+    service = AIService.__new__(AIService)
+    service.analysis_repo = StubAnalysisRepository()
+    service.model = object()
+    service.prompts = []
+
+    async def call_gemini(prompt):
+        service.prompts.append(prompt)
+        return json.dumps(replies[len(service.prompts) - 1])
+
+    service._call_gemini = call_gemini
+    return service
+
+
+def make_analysis(summary) -> dict:
+    return {
+        "summary": summary,
+        "savings_tip": "Cook at home",
+        "suggestions": [],
+        "discipline_score": 70,
+        "savings_rate": 0.2,
+        "timeline_impact": "On track",
+        "savings_potential": 50.0,
+        "risk_level": "Low",
+    }
+
+
+@pytest.mark.asyncio
+async def test_analysis_reused_for_same_snapshot_until_forced():
+    user_id = uuid.uuid4()
+    service = make_ai_service([make_analysis("first"), make_analysis("second"), make_analysis("third")])
+    expenses = [{"title": "Coffee", "amount": 3.5, "category": "Food", "date": "2024-01-15", "is_avoidable": True}]
+
+    first = await service.analyze_expenses(user_id, expenses)
+    again = await service.analyze_expenses(user_id, [dict(e) for e in expenses])
+    assert (first.summary, again.summary) == ("first", "first")
+    assert len(service.prompts) == 1
+
+    # Another user, or any change to the data, is a different snapshot
+    other = await service.analyze_expenses(uuid.uuid4(), expenses)
+    assert other.summary == "second"
+
+    forced = await service.analyze_expenses(user_id, expenses, force=True)
+    assert forced.summary == "third"
+    assert len(service.prompts) == 3
+    # The forced result replaces the stored one
+    assert (await service.analyze_expenses(user_id, expenses)).summary == "third"
@@ -19,7 +19,7 @@ async def test_auth():
         print(f"User email: {user.email}")
         print(f"Stored hash: {user.hashed_password}")
         
-        is_valid = security.verify_password(password, user.hashed_password)
+        is_valid = await security.verify_password(password, user.hashed_password)
         print(f"Password valid: {is_valid}")
 
 if __name__ == "__main__":